@@ -1,39 +1,127 @@
 import asyncio
-import appdaemon.utils
+import functools
+import inspect
+from appdaemon import utils as appdaemon_utils
+from appdaemon.adapi import ADAPI
+from appdaemon.adbase import ADBase
+from appdaemon.entity import Entity
+from appdaemon.plugins.hass.hassapi import Hass
+
+from appdaemontestframework.appdaemon_mock.appdaemon import get_shared_event_loop
+from appdaemontestframework.appdaemon_mock.scheduler import MockScheduler
+
 
 # Appdaemon 4 uses Python asyncio programming. Since our tests are not async
 # we replace the sync_wrapper decorator with one that will always result in
 # synchronizing appdatemon calls.
 def sync_wrapper(coro):
     def inner_sync_wrapper(self, *args, **kwargs):
-        start_new_loop = None
-        # try to get the running loop
-        # `get_running_loop()` is new in Python 3.7, fall back on privateinternal for 3.6
-        try:
-            get_running_loop = asyncio.get_running_loop
-        except AttributeError:
-            get_running_loop = asyncio._get_running_loop
+        # If a loop is running, the caller is async and awaits the returned future
+        if _get_running_loop() is not None:
+            # don't use create_task. It's python3.7 only
+            return asyncio.ensure_future(coro(self, *args, **kwargs))
+
+        loop = _event_loop_of(self)
 
-        # If there is no running loop we will need to start a new one and run it to completion
+        # Fast path: Most coroutines never suspend. Drive them to completion
+        # directly instead of round-tripping through the event loop.
+        # The loop is marked as running meanwhile, so the coroutine can still
+        # use `asyncio.get_running_loop()`, create futures, etc.
+        coroutine = coro(self, *args, **kwargs)
+        asyncio._set_running_loop(loop)
         try:
-            if get_running_loop():
-                start_new_loop = False
+            awaited = coroutine.send(None)
+        except StopIteration as done:
+            return done.value
+        finally:
+            asyncio._set_running_loop(None)
+
+        # The coroutine is waiting on something, let the event loop resume it
+        return loop.run_until_complete(_resume(coroutine, awaited))
+
+    return inner_sync_wrapper
+
+
+def _event_loop_of(hass):
+    """
+    The loop of the `MockAppDaemon` of `hass`, running on the time of its scheduler,
+    if it is open. The shared loop otherwise.
+    """
+    sched = getattr(getattr(hass, 'AD', None), 'sched', None)
+    if isinstance(sched, MockScheduler):
+        loop = sched.sim_event_loop()
+        if loop is not None and not loop.is_closed():
+            return loop
+    return get_shared_event_loop()
+
+
+def _get_running_loop():
+    # `get_running_loop()` raises when no loop is running, `_get_running_loop()` returns None
+    return asyncio._get_running_loop()
+
+
+async def _resume(coroutine, awaited):
+    """Finishes running a coroutine that already suspended once, waiting on `awaited`"""
+    return await _Suspended(coroutine, awaited)
+
+
+class _Suspended:
+    def __init__(self, coroutine, awaited):
+        self._coroutine = coroutine
+        self._awaited = awaited
+
+    def __await__(self):
+        # Same as `yield from`, except the coroutine was already started
+        coroutine, awaited = self._coroutine, self._awaited
+        while True:
+            try:
+                sent = yield awaited
+            except GeneratorExit:
+                coroutine.close()
+                raise
+            except BaseException as thrown:
+                try:
+                    awaited = coroutine.throw(thrown)
+                except StopIteration as done:
+                    return done.value
             else:
-                start_new_loop = True
-        except RuntimeError:
-            start_new_loop = True
-
-        if start_new_loop is True:
-            f = asyncio.ensure_future(coro(self, *args, **kwargs))
-            asyncio.get_event_loop().run_until_complete(f)
-            f = f.result()
-        else:
-            # don't use create_task. It's python3.7 only
-            f = asyncio.ensure_future(coro(self, *args, **kwargs))
+                try:
+                    awaited = coroutine.send(sent)
+                except StopIteration as done:
+                    return done.value
 
-        return f
+
+def _use_sync_wrapper_in(cls):
+    """
+    Newer AppDaemon versions wrap the async methods of their API with
+    `utils.sync_decorator` when the classes are defined, so patching the module
+    does not reach them: wrap the coroutine of each of these methods with our
+    `sync_wrapper` instead.
+    """
+    sync_decorator = getattr(appdaemon_utils, 'sync_decorator', None)
+    if sync_decorator is None:
+        return
+    decorated_code = sync_decorator(lambda self: None).__code__
+    for name, method in list(vars(cls).items()):
+        if getattr(method, '__code__', None) is decorated_code:
+            setattr(cls, name, _sync_wrapper_of_decorated(method.__wrapped__))
+
+
+def _sync_wrapper_of_decorated(coro):
+    # Like `sync_decorator`, only pass `timeout` to the coroutines expecting it
+    expects_timeout = 'timeout' in inspect.signature(coro).parameters
+    wrapper = sync_wrapper(coro)
+
+    @functools.wraps(coro)
+    def inner_sync_wrapper(self, *args, timeout=None, **kwargs):
+        if expects_timeout:
+            kwargs['timeout'] = timeout
+        return wrapper(self, *args, **kwargs)
 
     return inner_sync_wrapper
 
+
 # Monkey patch in our sync_wrapper
-appdaemon.utils.sync_wrapper = sync_wrapper
+appdaemon_utils.sync_wrapper = sync_wrapper
+for appdaemon_class in (ADBase, ADAPI, Hass, Entity):
+    _use_sync_wrapper_in(appdaemon_class)
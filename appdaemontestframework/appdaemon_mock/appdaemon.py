@@ -2,11 +2,51 @@ import asyncio
 import pytz
 import threading
 
+from appdaemontestframework.appdaemon_mock.event_loop import VirtualTimeEventLoop
+
+# Event loop shared by every `MockAppDaemon`, see `get_shared_event_loop()`
+_shared_event_loop = None
+
+
+def get_shared_event_loop():
+    """
+    Returns the event loop shared by every `MockAppDaemon`, a `VirtualTimeEventLoop`.
+    It is created on first use, and created again after `close_shared_event_loop()`.
+    """
+    global _shared_event_loop
+    if _shared_event_loop is None or _shared_event_loop.is_closed():
+        _shared_event_loop = VirtualTimeEventLoop()
+    return _shared_event_loop
+
+
+def close_shared_event_loop():
+    """Cancels the tasks left on the shared event loop and closes it"""
+    global _shared_event_loop
+    loop, _shared_event_loop = _shared_event_loop, None
+    if loop is None or loop.is_closed():
+        return
+    _cancel_pending_tasks(loop)
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+
+
+def _cancel_pending_tasks(loop):
+    if loop.is_running():
+        return
+    pending_tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    for task in pending_tasks:
+        task.cancel()
+    if pending_tasks:
+        loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
+
 
 class MockAppDaemon:
     """Implementation of appdaemon's internal AppDaemon class suitable for testing"""
 
-    def __init__(self, **kwargs):
+    def __init__(self, loop=None, **kwargs):
+        """
+        :param loop: Event loop to use. Defaults to the loop shared by every `MockAppDaemon`
+        """
 
         #
         # Import various AppDaemon bits and pieces now to avoid circular import
@@ -17,7 +57,34 @@ class MockAppDaemon:
         # Use UTC timezone just for testing.
         self.tz = pytz.timezone("UTC")
 
+        self.loop = loop
+        self.stopped = True
+
         self.sched = MockScheduler(self)
 
         # Add main_thread_id for compatibility with newer Appdaemon versions
         self.main_thread_id = threading.current_thread().ident
+
+        self.start()
+
+    ### Lifecycle
+    def start(self):
+        """Attaches to the event loop, which then runs on the time of `sched`. Called on creation"""
+        if self.loop is None or self.loop.is_closed():
+            self.loop = get_shared_event_loop()
+        if isinstance(self.loop, VirtualTimeEventLoop):
+            self.loop.attach_scheduler(self.sched)
+        self.stopped = False
+
+    def stop(self):
+        """
+        Cancels the tasks left on the event loop so they do not leak into the next test.
+        The loop itself is left open, the shared loop is closed by `close_shared_event_loop()`.
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        if not self.loop.is_closed():
+            _cancel_pending_tasks(self.loop)
+        if isinstance(self.loop, VirtualTimeEventLoop):
+            self.loop.detach_scheduler(self.sched)
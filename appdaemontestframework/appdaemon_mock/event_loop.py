@@ -0,0 +1,113 @@
+import asyncio
+import contextvars
+import datetime
+import math
+
+# Origin of the time of the loop: `loop.time()` is the number of seconds from
+# `_EPOCH` to the simulated time of the scheduler
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+# Task of an async app in which a sync callback runs inline, see `call_inline_sync_callback()`
+_task_running_sync_callback = contextvars.ContextVar('_task_running_sync_callback', default=None)
+
+
+def call_inline_sync_callback(callback, *args):
+    """
+    Call `callback` of an app, possibly from within the task of an async app (eg. a state
+    listener called when an async app sets a state). A sync callback is not part of the
+    async app: for it, `current_app_task()` is `None`.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        # Called outside of the event loop
+        return callback(*args)
+    token = _task_running_sync_callback.set(task)
+    try:
+        return callback(*args)
+    finally:
+        _task_running_sync_callback.reset(token)
+
+
+def current_app_task(loop):
+    """Task of the async app running on `loop`, `None` if the code running is sync"""
+    task = asyncio.current_task(loop)
+    if task is None or task is _task_running_sync_callback.get():
+        return None
+    return task
+
+
+def to_loop_time(naive_datetime):
+    return (naive_datetime - _EPOCH).total_seconds()
+
+
+def from_loop_time(loop_time):
+    """Rounded up to the microsecond, so the loop time is always reached"""
+    return _EPOCH + datetime.timedelta(microseconds=math.ceil(loop_time * 1_000_000))
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop running on the simulated time of a `MockScheduler`
+
+    `loop.time()` is the time of the attached scheduler, so timers
+    (`asyncio.sleep()`, `loop.call_later()`, ...) never wait for real:
+    - When the scheduler fast forwards, it runs the timers falling due on the way.
+    - When the loop runs until a future completes and nothing is ready, the
+      scheduler fast forwards straight to the next timer, running its own
+      callbacks due before.
+
+    Without a scheduler attached, the loop uses the real time.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._scheduler = None
+        # Timers due within the clock resolution are run. The simulated time is
+        # only precise to the microsecond, and at that scale the real clock
+        # resolution would be lost in floating point rounding.
+        self._clock_resolution = 1e-6
+
+    def attach_scheduler(self, scheduler):
+        self._scheduler = scheduler
+
+    def detach_scheduler(self, scheduler):
+        if self._scheduler is scheduler:
+            self._scheduler = None
+
+    def time(self):
+        if self._scheduler is None:
+            return super().time()
+        return to_loop_time(self._scheduler._now)
+
+    def next_timer_time(self):
+        """Loop time of the next pending timer, or `None` if there is none"""
+        return min(
+            (timer.when() for timer in self._scheduled if not timer.cancelled()),
+            default=None,
+        )
+
+    def run_until_idle(self):
+        """
+        Runs the callbacks ready now and the timers due now, as well as
+        everything they make ready, without moving time forward.
+        Does nothing if the loop is already running.
+        """
+        if self.is_running():
+            return
+        while self._ready or self._has_timer_due():
+            self.call_soon(self.stop)
+            self.run_forever()
+
+    def _has_timer_due(self):
+        next_timer_time = self.next_timer_time()
+        return next_timer_time is not None and next_timer_time <= self.time()
+
+    def _run_once(self):
+        if self._scheduler is not None and not self._ready and not self._stopping:
+            # Nothing to do before the next timer: jump straight to it
+            next_timer_time = self.next_timer_time()
+            if next_timer_time is not None and next_timer_time > self.time():
+                self._scheduler.sim_fast_forward(from_loop_time(next_timer_time))
+        super()._run_once()
@@ -1,10 +1,22 @@
 import datetime
-import uuid
+import heapq
+import itertools
+import re
 import pytz
 import asyncio
-import threading
 from typing import Any, Callable, Optional
 from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon
+from appdaemontestframework.appdaemon_mock.event_loop import (
+    VirtualTimeEventLoop,
+    call_inline_sync_callback,
+    from_loop_time,
+)
+
+# Callbacks `sim_fast_forward_until_idle()` runs at most by default
+DEFAULT_MAX_CALLBACKS_UNTIL_IDLE = 100_000
+
+# `now`, `now+N` or `now - N` (in seconds), like AppDaemon's `parse_datetime`
+_NOW_REGEX = re.compile(r"^now(\s*(?P<sign>[-+])\s*(?P<offset>.*?))?$", re.IGNORECASE)
 
 
 class MockScheduler:
@@ -12,44 +24,41 @@ class MockScheduler:
 
     def __init__(self, AD: MockAppDaemon):
         self.AD = AD
-        self._registered_callbacks = []
-        self._loop = None
-        self._loop_thread = None
+        # Priority queue of `(run_date_time, sequence, CallbackInfo)` entries.
+        # The sequence number is taken at registration time so callbacks due
+        # at the same time always run in the order they were registered. It
+        # also gives each callback a cheap and deterministic handle.
+        self._queue = []
+        self._sequence = itertools.count(1)
+        # Live callbacks by handle. Cancelling a timer only removes it from
+        # here and flags it, the stale queue entry is dropped when it reaches
+        # the top of the queue.
+        self._callbacks_by_handle = {}
+        # Number of pending callbacks which are not recurring
+        self._pending_one_off_callbacks = 0
+        # Tasks running async callbacks, until they are done
+        self._tasks = []
 
         # Default to Jan 1st, 2000 12:00AM
         # internal time is stored as a naive datetime in UTC
-        self.sim_set_start_time(datetime.datetime(2000, 1, 1, 0, 0))
-
-        # Initialize event loop for async operations
-        self._ensure_event_loop()
-
-    def _ensure_event_loop(self):
-        """Ensure we have an event loop available for async operations"""
-        try:
-            self._loop = asyncio.get_running_loop()
-        except RuntimeError:
-            # No running loop, create our own
-            self._loop = asyncio.new_event_loop()
-            # Don't set as the running loop here to avoid conflicts
+        self._start_time = self._now = datetime.datetime(2000, 1, 1, 0, 0)
 
     def _run_async(self, coro):
-        """Run an async coroutine in our event loop"""
-        if self._loop is None:
-            self._ensure_event_loop()
-
+        """Run an async coroutine in the event loop of `MockAppDaemon`"""
+        loop = self.sim_event_loop()
         try:
             # If we're already in an event loop context
             running_loop = asyncio.get_running_loop()
-            if running_loop == self._loop:
+            if running_loop == loop:
                 # We're already in our loop
                 return asyncio.create_task(coro)
             else:
                 # Different loop is running, use run_coroutine_threadsafe
-                future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+                future = asyncio.run_coroutine_threadsafe(coro, loop)
                 return future.result()
         except RuntimeError:
             # No running loop, we can use run_until_complete
-            return self._loop.run_until_complete(coro)
+            return loop.run_until_complete(coro)
 
     ### Implement the AppDaemon APIs for Scheduler
     async def get_now(self):
@@ -75,25 +84,80 @@ class MockScheduler:
         """Synchronous version of get_now_naive"""
         return self.make_naive(self.get_now_sync())
 
-    async def insert_schedule(self, name, aware_dt, callback, repeat, type_, **kwargs):
-        naive_dt = self.make_naive(aware_dt)
-        return self._queue_callback(callback, kwargs, naive_dt)
+    async def insert_schedule(
+        self, name, aware_dt, callback, repeat, type_, interval=0, **kwargs
+    ):
+        return self.insert_schedule_sync(
+            name, aware_dt, callback, repeat, type_, interval, **kwargs
+        )
 
-    def insert_schedule_sync(self, name, aware_dt, callback, repeat, type_, **kwargs):
+    def insert_schedule_sync(
+        self, name, aware_dt, callback, repeat, type_, interval=0, **kwargs
+    ):
         """Synchronous version of insert_schedule"""
         naive_dt = self.make_naive(aware_dt)
-        return self._queue_callback(callback, kwargs, naive_dt)
+        return self._queue_callback(callback, kwargs, naive_dt, interval)
+
+    def insert_one_off_schedule_sync(self, name, start, callback, type_, **kwargs):
+        """
+        Queue `callback` to run once at `start` (a datetime, or the next `start`
+        as given to `get_next_period_sync`) and return its handle.
+
+        A callback registered for a time of day follows that time of day when
+        the start time of the simulation is set afterwards.
+        """
+        if isinstance(start, datetime.datetime):
+            run_date_time = self.make_naive(self.convert_naive(start))
+            return self._queue_callback(callback, kwargs, run_date_time, fixed=True)
+
+        start_date_time, time_of_day = self._parse_start(start)
+        if start_date_time <= self._now:
+            start_date_time = _first_period_after(
+                start_date_time, datetime.timedelta(days=1), self._now
+            )
+        return self._queue_callback(
+            callback, kwargs, start_date_time, time_of_day=time_of_day
+        )
+
+    async def get_next_period(self, interval, start=None):
+        return self.get_next_period_sync(interval, start)
+
+    def get_next_period_sync(self, interval, start=None):
+        """Synchronous version of get_next_period
+
+        Return the first aware datetime strictly after now on the grid of
+        `interval` starting at `start`. `start` can be `None` / "now",
+        "immediate", a time, a datetime or a time string like "13:45:00".
+        """
+        interval = _as_timedelta(interval)
+        if interval <= datetime.timedelta(0):
+            raise ValueError("The interval of a recurring callback must be positive")
+
+        if start == "immediate":
+            return self.get_now_sync()
+        start_datetime, _ = self._parse_start(start)
+
+        if start_datetime <= self._now:
+            start_datetime = _first_period_after(start_datetime, interval, self._now)
+        return self.convert_naive(start_datetime)
 
     async def cancel_timer(self, name, handle):
         return self.cancel_timer_sync(name, handle)
 
     def cancel_timer_sync(self, name, handle):
         """Synchronous version of cancel_timer"""
-        for callback in self._registered_callbacks:
-            if callback.handle == handle:
-                self._registered_callbacks.remove(callback)
-                return True
-        return False
+        callback = self._callbacks_by_handle.pop(handle, None)
+        if callback is None:
+            return False
+        callback.cancelled = True
+        if not callback.interval:
+            self._pending_one_off_callbacks -= 1
+        self._compact_queue_if_mostly_cancelled()
+        return True
+
+    def timer_handles(self):
+        """Handles of the pending callbacks"""
+        return list(self._callbacks_by_handle)
 
     def convert_naive(self, dt):
         # Is it naive?
@@ -125,16 +189,26 @@ class MockScheduler:
         if time is time, it will set to that time with the current date.
         All dates/datetimes should be localized naive
 
-        To guarantee consistency, you can not set the start time while any callbacks are scheduled.
+        The callbacks already scheduled (eg. in `initialize()`) follow:
+        - Recurring callbacks are moved to their first run after the new start time.
+        - One-off callbacks registered for a time of day (`run_once`, `run_at`) are
+          moved to the next occurrence of that time.
+        - Other one-off callbacks (`run_in`, `duration` of `listen_state`, ...) keep
+          their delay from now.
+        - One-off callbacks registered at a datetime stay at that datetime, which must
+          not be before the new start time.
         """
-        if len(self._registered_callbacks) > 0:
-            raise RuntimeError(
-                "You can not set start time while callbacks are scheduled"
-            )
-
         if type(time) == datetime.time:
             time = datetime.datetime.combine(self._now.date(), time)
+        for callback in self._callbacks_by_handle.values():
+            if callback.fixed and callback.run_date_time < time:
+                raise RuntimeError(
+                    f"You can not set start time after a callback scheduled at {callback.run_date_time}"
+                )
+
+        offset = time - self._now
         self._start_time = self._now = time
+        self._reschedule_callbacks_after_now(offset)
 
     def sim_get_start_time(self):
         """returns localized naive datetime of the start of the simulation"""
@@ -162,58 +236,297 @@ class MockScheduler:
 
         self._run_callbacks_and_advance_time(target_datetime)
 
+    def sim_next_event_time(self):
+        """Returns localized naive datetime of the next scheduled callback or event loop timer,
+        or `None` if nothing is scheduled"""
+        next_event_date_time = self._next_event_date_time()
+        if next_event_date_time is None:
+            return None
+        return pytz.utc.localize(next_event_date_time)
+
+    def sim_fast_forward_to_next_event(self):
+        """Jump straight to the next scheduled callback or event loop timer and run everything due at that time.
+
+        Returns the new localized current time, or `None` (without moving time) if nothing is scheduled.
+        """
+        next_event_date_time = self._next_event_date_time()
+        if next_event_date_time is None:
+            return None
+        self._run_callbacks_and_advance_time(next_event_date_time)
+        return self.get_now_sync()
+
+    def sim_fast_forward_until_idle(self, max_callbacks=DEFAULT_MAX_CALLBACKS_UNTIL_IDLE):
+        """Jump from one scheduled callback to the next until no one-off callback and no
+        event loop timer (`await self.sleep()`, ...) is left.
+
+        Recurring callbacks never run out, so they do not keep the simulation busy, but
+        they are still run whenever they fall due before the last one-off callback.
+        To protect against callbacks re-scheduling themselves forever, a `RuntimeError`
+        is raised after running `max_callbacks` callbacks, unless it is `None`.
+        """
+        callbacks_run = 0
+        while self._pending_one_off_callbacks > 0 or self._next_event_loop_timer() is not None:
+            if max_callbacks is not None and callbacks_run >= max_callbacks:
+                raise RuntimeError(
+                    f"Still not idle after running {max_callbacks} callbacks"
+                )
+            callbacks_run += self._run_callbacks_and_advance_time(
+                self._next_event_date_time()
+            )
+        return self.get_now_sync()
+
+    def sim_event_loop(self):
+        """Returns the event loop of AppDaemon, running on the simulated time of this scheduler"""
+        loop = self.AD.loop
+        if isinstance(loop, VirtualTimeEventLoop):
+            loop.attach_scheduler(self)
+        return loop
+
     ### Internal functions
-    def _queue_callback(self, callback_function, kwargs, run_date_time):
+    def _queue_callback(
+        self, callback_function, kwargs, run_date_time, interval=0, time_of_day=None, fixed=False
+    ):
         """queue a new callback and return its handle"""
-        interval = kwargs.get("interval", 0)
-        new_callback = CallbackInfo(callback_function, kwargs, run_date_time, interval)
+        sequence = next(self._sequence)
+        new_callback = CallbackInfo(
+            f"timer-{sequence}",
+            sequence,
+            callback_function,
+            kwargs,
+            run_date_time,
+            _as_timedelta(interval),
+            time_of_day,
+            fixed,
+        )
 
         if new_callback.run_date_time < self._now:
             raise ValueError("Can not schedule events in the past")
 
-        self._registered_callbacks.append(new_callback)
+        self._callbacks_by_handle[new_callback.handle] = new_callback
+        if not new_callback.interval:
+            self._pending_one_off_callbacks += 1
+        self._push(new_callback)
         return new_callback.handle
 
+    def _push(self, callback):
+        heapq.heappush(
+            self._queue, (callback.run_date_time, callback.sequence, callback)
+        )
+
+    def _parse_start(self, start):
+        """
+        Naive datetime of `start`, and the time of day it stands for if any. `start`
+        is `None` / `"now"`, `"now+N"` (seconds), a time, a datetime, or an ISO string of them.
+        """
+        if start is None:
+            return self._now, None
+        if isinstance(start, datetime.datetime):
+            return self.make_naive(self.convert_naive(start)), None
+        if isinstance(start, str):
+            now_match = _NOW_REGEX.match(start.strip())
+            if now_match is not None:
+                offset = datetime.timedelta(seconds=float(now_match.group("offset") or 0))
+                if now_match.group("sign") == "-":
+                    offset = -offset
+                return self._now + offset, None
+            try:
+                start = datetime.time.fromisoformat(start)
+            except ValueError:
+                return self._parse_start(datetime.datetime.fromisoformat(start))
+        return datetime.datetime.combine(self._now.date(), start), start
+
+    def _reschedule_callbacks_after_now(self, offset):
+        """Move the pending callbacks after the start time was set, `offset` from the previous time"""
+        for callback in self._callbacks_by_handle.values():
+            if callback.interval:
+                callback.run_date_time = _first_period_after(
+                    callback.run_date_time, callback.interval, self._now
+                )
+            elif callback.time_of_day is not None:
+                callback.run_date_time = _first_period_after(
+                    datetime.datetime.combine(self._now.date(), callback.time_of_day),
+                    datetime.timedelta(days=1),
+                    self._now,
+                )
+            elif not callback.fixed:
+                callback.run_date_time += offset
+        self._queue = [
+            (callback.run_date_time, callback.sequence, callback)
+            for callback in self._callbacks_by_handle.values()
+        ]
+        heapq.heapify(self._queue)
+
+    def _compact_queue_if_mostly_cancelled(self):
+        """Drop cancelled entries once they make up most of the queue"""
+        if len(self._queue) > 2 * len(self._callbacks_by_handle) + 64:
+            self._queue = [
+                entry for entry in self._queue if not entry[2].cancelled
+            ]
+            heapq.heapify(self._queue)
+
+    def _next_run_date_time(self):
+        while self._queue and self._queue[0][2].cancelled:
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return None
+        return self._queue[0][0]
+
+    def _next_event_loop_timer(self):
+        """Naive datetime of the next timer of the event loop, or `None`
+
+        Timers are only run from here while the loop is not running. When it runs, the loop
+        asks the scheduler to fast forward to its timers by itself.
+        """
+        loop = self.sim_event_loop()
+        if not isinstance(loop, VirtualTimeEventLoop) or loop.is_running() or loop.is_closed():
+            return None
+        next_timer_time = loop.next_timer_time()
+        if next_timer_time is None:
+            return None
+        return max(from_loop_time(next_timer_time), self._now)
+
+    def _next_event_date_time(self):
+        """Naive datetime of the next scheduled callback or event loop timer, or `None`"""
+        next_date_times = [
+            date_time
+            for date_time in (self._next_run_date_time(), self._next_event_loop_timer())
+            if date_time is not None
+        ]
+        return min(next_date_times, default=None)
+
+    def _start_task(self, coroutine):
+        """Run the coroutine of an async callback as a task of the event loop"""
+        self._tasks.append(self.sim_event_loop().create_task(coroutine))
+
+    def _run_callback(self, callback, *args):
+        """Call a callback of an app, then run it on the event loop if it is async"""
+        self._run_callback_result(call_inline_sync_callback(callback, *args))
+
+    def _run_callback_result(self, result):
+        """Async callbacks return a coroutine: run it on the event loop until it waits"""
+        if asyncio.iscoroutine(result):
+            self._start_task(result)
+            self._run_event_loop_until_idle()
+
+    def _run_event_loop_until_idle(self):
+        """Run what is ready on the event loop, then raise the exception of any failed task"""
+        loop = self.sim_event_loop()
+        if loop.is_closed() or loop.is_running():
+            return
+        if isinstance(loop, VirtualTimeEventLoop):
+            loop.run_until_idle()
+        else:
+            loop.call_soon(loop.stop)
+            loop.run_forever()
+
+        done_tasks = [task for task in self._tasks if task.done()]
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for task in done_tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
     def _run_callbacks_and_advance_time(self, target_datetime, run_callbacks=True):
-        """run all callbacks scheduled between now and target_datetime"""
+        """run all callbacks and event loop timers scheduled between now and target_datetime
+        and return how many were run
+
+        Time jumps directly from one due callback to the next, so the cost only depends on the
+        number of callbacks run, not on how far in the future `target_datetime` is.
+        """
         if target_datetime < self._now:
             raise ValueError("You can not fast forward to a time in the past.")
 
+        callbacks_run = 0
         while True:
-            callbacks_to_run = [
-                x
-                for x in self._registered_callbacks
-                if x.run_date_time <= target_datetime
-            ]
-            if not callbacks_to_run:
+            next_run_date_time = self._next_run_date_time()
+            next_event_loop_timer = self._next_event_loop_timer()
+            if next_event_loop_timer is not None and next_event_loop_timer <= target_datetime and (
+                next_run_date_time is None or next_event_loop_timer < next_run_date_time
+            ):
+                # Let the event loop run the timers now due, eg. `await self.sleep()`
+                self._now = next_event_loop_timer
+                callbacks_run += 1
+                self._run_event_loop_until_idle()
+                continue
+            if next_run_date_time is None or next_run_date_time > target_datetime:
                 break
-            # sort so we call them in the order from oldest to newest
-            callbacks_to_run.sort(key=lambda cb: cb.run_date_time)
+
             # dispatch the oldest callback
-            callback = callbacks_to_run[0]
+            callback = self._queue[0][2]
             self._now = callback.run_date_time
-            if run_callbacks:
-                callback()
-            if callback.interval > 0:
-                callback.run_date_time += datetime.timedelta(seconds=callback.interval)
+            callbacks_run += 1
+            result = callback() if run_callbacks else None
+            if asyncio.iscoroutine(result):
+                self._start_task(result)
+            if self._queue and self._queue[0][2] is callback:
+                heapq.heappop(self._queue)
+            if callback.cancelled:
+                # The callback cancelled its own timer while running
+                continue
+            if callback.interval:
+                callback.run_date_time += callback.interval
+                self._push(callback)
             else:
-                self._registered_callbacks.remove(callback)
+                del self._callbacks_by_handle[callback.handle]
+                self._pending_one_off_callbacks -= 1
+            self._run_event_loop_until_idle()
 
         self._now = target_datetime
+        return callbacks_run
 
     def __getattr__(self, name: str):
         raise RuntimeError(f"'{name}' has not been mocked in {self.__class__.__name__}")
 
 
+def _as_timedelta(interval):
+    """Intervals can be given as a timedelta or as a number of seconds"""
+    if isinstance(interval, datetime.timedelta):
+        return interval
+    return datetime.timedelta(seconds=interval)
+
+
+def _first_period_after(anchor, interval, moment):
+    """First datetime strictly after `moment` on the grid of `interval` going through `anchor`"""
+    return anchor + ((moment - anchor) // interval + 1) * interval
+
+
 class CallbackInfo:
     """Class to hold info about a scheduled callback"""
 
-    def __init__(self, callback_function, kwargs, run_date_time, interval):
-        self.handle = str(uuid.uuid4())
+    __slots__ = (
+        "handle",
+        "sequence",
+        "cancelled",
+        "run_date_time",
+        "callback_function",
+        "kwargs",
+        "interval",
+        "time_of_day",
+        "fixed",
+    )
+
+    def __init__(
+        self,
+        handle,
+        sequence,
+        callback_function,
+        kwargs,
+        run_date_time,
+        interval,
+        time_of_day=None,
+        fixed=False,
+    ):
+        self.handle = handle
+        self.sequence = sequence
+        self.cancelled = False
         self.run_date_time = run_date_time
         self.callback_function = callback_function
         self.kwargs = kwargs
         self.interval = interval
+        # Time of day a one-off callback was registered for, `None` if not registered for one
+        self.time_of_day = time_of_day
+        # Whether a one-off callback was registered at a datetime
+        self.fixed = fixed
 
     def __call__(self):
-        self.callback_function(self.kwargs)
+        """Returns a coroutine to await for async callbacks"""
+        return self.callback_function(self.kwargs)
@@ -1,6 +1,9 @@
 import textwrap
 from abc import ABC, abstractmethod
 
+from appdaemontestframework.call_recorder import CallRecorder
+from appdaemontestframework.common import run_initialize
+
 
 ### Custom Matchers ##################################################
 
@@ -17,7 +20,7 @@ class ServiceOnAnyDomain:
         Turn on service look like: 'DOMAIN/SERVICE'
         We just check that the SERVICE part is equal
         """
-        return self.service in other
+        return isinstance(other, str) and other.partition('/')[2] == self.service[1:]
 
     def __repr__(self):
         return "'ANY_DOMAIN" + self.service + "'"
@@ -35,6 +38,173 @@ assert 'asdfasdf' == AnyString()
 ######################################################################
 
 
+### Recorded Calls Index #############################################
+
+
+class _RecordedCallIndex:
+    """
+    Calls recorded by a mock, grouped by `key_of_call(args, kwargs)`.
+
+    The index is updated on lookup, with only the calls recorded since the
+    previous lookup, and built again from scratch if the mock was reset.
+    """
+
+    def __init__(self, name, mock_to_index, key_of_call):
+        self.name = name
+        self._mock = mock_to_index
+        self._key_of_call = key_of_call
+        self._indexed_calls = None
+        self._indexed_count = 0
+        self._calls_by_key = {}
+
+    def calls_with_key(self, key):
+        self._index_new_calls()
+        return self._calls_by_key.get(key, ())
+
+    def all_calls(self):
+        self._index_new_calls()
+        return self._indexed_calls
+
+    def has_call(self, key, args, kwargs):
+        """
+        Returns whether a call matching `args` and `kwargs` was recorded.
+        Use `_NOT_INDEXABLE` as key when the expected call could match calls with any key.
+        """
+        if key is _NOT_INDEXABLE:
+            candidates = self.all_calls()
+        else:
+            candidates = self.calls_with_key(key)
+        return any(
+            args == call_args and kwargs == call_kwargs
+            for call_args, call_kwargs in candidates
+        )
+
+    def describe_missing_call(self, key, args, kwargs):
+        """
+        Failure message for a call matching `args` and `kwargs` that was not recorded.
+        Only a summary of the recorded calls is included: the calls with the same key
+        if any, or the last calls otherwise.
+        """
+        lines = [_format_call(self.name, args, kwargs) + ' call not found']
+        recorded_calls = self.all_calls()
+        if not recorded_calls:
+            lines.append("'%s' was never called" % self.name)
+            return '\n'.join(lines)
+
+        similar_calls = () if key is _NOT_INDEXABLE else self.calls_with_key(key)
+        if similar_calls:
+            lines.append("%s call(s) to '%s' with the same target, out of %s:"
+                         % (len(similar_calls), self.name, len(recorded_calls)))
+            calls_to_show = similar_calls
+        else:
+            lines.append("No call to '%s' with the same target, out of %s call(s). Last call(s):"
+                         % (self.name, len(recorded_calls)))
+            calls_to_show = recorded_calls
+
+        if len(calls_to_show) > _MAX_CALLS_IN_FAILURE_MESSAGE:
+            lines.append('  ... (%s earlier)' % (len(calls_to_show) - _MAX_CALLS_IN_FAILURE_MESSAGE))
+        for call_args, call_kwargs in calls_to_show[-_MAX_CALLS_IN_FAILURE_MESSAGE:]:
+            lines.append('  ' + _format_call(self.name, call_args, call_kwargs))
+        return '\n'.join(lines)
+
+    def _index_new_calls(self):
+        if isinstance(self._mock, CallRecorder):
+            calls = self._mock.calls
+        else:
+            # Each `call` in `call_args_list` unpacks to `(args, kwargs)`
+            calls = self._mock.call_args_list
+
+        if calls is not self._indexed_calls or len(calls) < self._indexed_count:
+            self._indexed_calls = calls
+            self._indexed_count = 0
+            self._calls_by_key = {}
+
+        for call_args, call_kwargs in calls[self._indexed_count:]:
+            key = self._key_of_call(call_args, call_kwargs)
+            self._calls_by_key.setdefault(key, []).append((call_args, call_kwargs))
+        self._indexed_count = len(calls)
+
+
+_MAX_CALLS_IN_FAILURE_MESSAGE = 10
+_MAX_CALL_LENGTH_IN_FAILURE_MESSAGE = 200
+
+
+def _format_call(name, args, kwargs):
+    formatted_args = [repr(arg) for arg in args]
+    formatted_args += ['%s=%r' % item for item in kwargs.items()]
+    formatted_call = '%s(%s)' % (name, ', '.join(formatted_args))
+    if len(formatted_call) > _MAX_CALL_LENGTH_IN_FAILURE_MESSAGE:
+        formatted_call = formatted_call[:_MAX_CALL_LENGTH_IN_FAILURE_MESSAGE - 3] + '...'
+    return formatted_call
+
+
+class _NotIndexable:
+    def __repr__(self):
+        return '_NOT_INDEXABLE'
+
+
+_NOT_INDEXABLE = _NotIndexable()
+
+
+def _service_part(service):
+    """'DOMAIN/SERVICE' -> 'SERVICE'"""
+    return service.partition('/')[2]
+
+
+def _service_call_key(args, kwargs):
+    """`call_service` calls are indexed by (SERVICE part of the service, entity_id)"""
+    if not args or not isinstance(args[0], str):
+        return _NOT_INDEXABLE
+    entity_id = kwargs.get('entity_id')
+    if entity_id is not None and not isinstance(entity_id, str):
+        return (_service_part(args[0]), _NOT_INDEXABLE)
+    return (_service_part(args[0]), entity_id)
+
+
+def _expected_service_call_key(args, kwargs):
+    """
+    Key of the `call_service` calls an expected call can match. Matchers (eg. `mock.ANY`)
+    can be equal to calls with any key: all the calls are then checked.
+    """
+    if not args or type(args[0]) is not str:
+        return _NOT_INDEXABLE
+    entity_id = kwargs.get('entity_id')
+    if entity_id is not None and type(entity_id) is not str:
+        return _NOT_INDEXABLE
+    return (_service_part(args[0]), entity_id)
+
+
+def _entity_call_key(args, _kwargs):
+    """`turn_on` & `turn_off` calls are indexed by entity_id, `fire_event` calls by event"""
+    if not args or not isinstance(args[0], str):
+        return _NOT_INDEXABLE
+    return args[0]
+
+
+def _expected_entity_call_key(args, _kwargs):
+    """Key of the `turn_on`, `turn_off` & `fire_event` calls an expected call can match"""
+    if not args or type(args[0]) is not str:
+        return _NOT_INDEXABLE
+    return args[0]
+
+
+class _CallIndexes:
+    """Indexes on the calls recorded by the mocks `WasWrapper` checks"""
+
+    def __init__(self, hass_functions):
+        self.call_service = _RecordedCallIndex(
+            'call_service', hass_functions['call_service'], _service_call_key)
+        self.turn_on = _RecordedCallIndex(
+            'turn_on', hass_functions['turn_on'], _entity_call_key)
+        self.turn_off = _RecordedCallIndex(
+            'turn_off', hass_functions['turn_off'], _entity_call_key)
+        self.fire_event = _RecordedCallIndex(
+            'fire_event', hass_functions['fire_event'], _entity_call_key)
+
+
+######################################################################
+
+
 ### Custom Exception #################################################
 class EitherOrAssertionError(AssertionError):
     def __init__(self, first_assertion_error, second_assertion_error):
@@ -71,54 +241,85 @@ class Was(ABC):
     def called(self):
         self.called_with()
 
+    @abstractmethod
+    def fired(self, **event_data):
+        pass
+
 
 class WasWrapper(Was):
-    def __init__(self, thing_to_check, hass_functions):
+    def __init__(self, thing_to_check, hass_functions, call_indexes=None):
         self.thing_to_check = thing_to_check
         self.hass_functions = hass_functions
+        self._call_indexes = call_indexes or _CallIndexes(hass_functions)
 
     def turned_on(self, **service_specific_parameters):
         """ Assert that a given entity_id has been turned on """
-        entity_id = self.thing_to_check
-
-        service_not_called = _capture_assert_failure_exception(
-            lambda: self.hass_functions['call_service'].assert_any_call(
-                ServiceOnAnyDomain('turn_on'),
-                **{'entity_id': entity_id, **service_specific_parameters}))
-
-        turn_on_helper_not_called = _capture_assert_failure_exception(
-            lambda: self.hass_functions['turn_on'].assert_any_call(
-                entity_id,
-                **service_specific_parameters))
-
-        if service_not_called and turn_on_helper_not_called:
-            raise EitherOrAssertionError(
-                service_not_called, turn_on_helper_not_called)
+        if not self._was_turned('turn_on', service_specific_parameters):
+            raise self._not_turned_error('turn_on', service_specific_parameters)
 
     def turned_off(self, **service_specific_parameters):
         """ Assert that a given entity_id has been turned off """
-        entity_id = self.thing_to_check
-
-        service_not_called = _capture_assert_failure_exception(
-            lambda: self.hass_functions['call_service'].assert_any_call(
-                ServiceOnAnyDomain('turn_off'),
-                **{'entity_id': entity_id, **service_specific_parameters}))
-
-        turn_off_helper_not_called = _capture_assert_failure_exception(
-            lambda: self.hass_functions['turn_off'].assert_any_call(
-                entity_id,
-                **service_specific_parameters))
-
-        if service_not_called and turn_off_helper_not_called:
-            raise EitherOrAssertionError(
-                service_not_called, turn_off_helper_not_called)
+        if not self._was_turned('turn_off', service_specific_parameters):
+            raise self._not_turned_error('turn_off', service_specific_parameters)
 
     def called_with(self, **kwargs):
         """ Assert that a given service has been called with the given arguments"""
+        if not self._was_called_with(kwargs):
+            service_full_name = self.thing_to_check
+            raise AssertionError(self._call_indexes.call_service.describe_missing_call(
+                _expected_service_call_key((service_full_name,), kwargs),
+                (service_full_name,),
+                kwargs))
+
+    def fired(self, **event_data):
+        """ Assert that a given event has been fired with the given data"""
+        if not self._was_fired(event_data):
+            event = self.thing_to_check
+            raise AssertionError(self._call_indexes.fire_event.describe_missing_call(
+                _expected_entity_call_key((event,), event_data), (event,), event_data))
+
+    def _was_turned(self, service, service_specific_parameters):
+        """ Whether the entity was turned on/off via `call_service` or via the helper """
+        entity_id = self.thing_to_check
+        service_call = self._service_call(service, service_specific_parameters)
+        helper_index = getattr(self._call_indexes, service)
+        return (
+            self._call_indexes.call_service.has_call(*service_call)
+            or helper_index.has_call(
+                _expected_entity_call_key((entity_id,), service_specific_parameters),
+                (entity_id,),
+                service_specific_parameters))
+
+    def _was_called_with(self, kwargs):
         service_full_name = self.thing_to_check
-
-        self.hass_functions['call_service'].assert_any_call(
-            service_full_name, **kwargs)
+        return self._call_indexes.call_service.has_call(
+            _expected_service_call_key((service_full_name,), kwargs),
+            (service_full_name,),
+            kwargs)
+
+    def _was_fired(self, event_data):
+        event = self.thing_to_check
+        return self._call_indexes.fire_event.has_call(
+            _expected_entity_call_key((event,), event_data), (event,), event_data)
+
+    def _service_call(self, service, service_specific_parameters):
+        """ (key, args, kwargs) of the `call_service` call turning the entity on/off """
+        service_kwargs = {'entity_id': self.thing_to_check, **service_specific_parameters}
+        service_key = _expected_service_call_key((service,), service_kwargs)
+        if service_key is not _NOT_INDEXABLE:
+            service_key = (service, service_key[1])
+        return service_key, (ServiceOnAnyDomain(service),), service_kwargs
+
+    def _not_turned_error(self, service, service_specific_parameters):
+        entity_id = self.thing_to_check
+        helper_index = getattr(self._call_indexes, service)
+        return EitherOrAssertionError(
+            self._call_indexes.call_service.describe_missing_call(
+                *self._service_call(service, service_specific_parameters)),
+            helper_index.describe_missing_call(
+                _expected_entity_call_key((entity_id,), service_specific_parameters),
+                (entity_id,),
+                service_specific_parameters))
 
 
 class WasNotWrapper(Was):
@@ -127,37 +328,57 @@ class WasNotWrapper(Was):
 
     def turned_on(self, **service_specific_parameters):
         """ Assert that a given entity_id has NOT been turned ON w/ the given parameters"""
-        thing_not_turned_on_with_given_params = _capture_assert_failure_exception(
-            lambda: self.was_wrapper.turned_on(**service_specific_parameters))
-
-        if not thing_not_turned_on_with_given_params:
+        if self.was_wrapper._was_turned('turn_on', service_specific_parameters):
             raise AssertionError(
                 "Should NOT have been turned ON w/ the given params: "
                 + str(self.was_wrapper.thing_to_check))
 
     def turned_off(self, **service_specific_parameters):
         """ Assert that a given entity_id has NOT been turned OFF """
-        thing_not_turned_off = _capture_assert_failure_exception(
-            lambda: self.was_wrapper.turned_off(**service_specific_parameters))
-
-        if not thing_not_turned_off:
+        if self.was_wrapper._was_turned('turn_off', service_specific_parameters):
             raise AssertionError(
                 "Should NOT have been turned OFF: "
                 + str(self.was_wrapper.thing_to_check))
 
     def called_with(self, **kwargs):
         """ Assert that a given service has NOT been called with the given arguments"""
-        service_not_called = _capture_assert_failure_exception(
-            lambda: self.was_wrapper.called_with(**kwargs))
-
-        if not service_not_called:
+        if self.was_wrapper._was_called_with(kwargs):
             raise AssertionError(
                 "Service shoud NOT have been called with the given args: " + str(kwargs))
 
+    def fired(self, **event_data):
+        """ Assert that a given event has NOT been fired with the given data"""
+        if self.was_wrapper._was_fired(event_data):
+            raise AssertionError(
+                "Event should NOT have been fired with the given data: "
+                + str(self.was_wrapper.thing_to_check) + ' ' + str(event_data))
+
+
+def _run_initialize_again(automation, hass_mocks):
+    """
+    Run `initialize()` again to record the registrations it makes, then cancel the
+    listeners and timers this second run added: only the ones of the first run stay active.
+    """
+    scheduler = hass_mocks.AD.sched
+    registries = [
+        (scheduler.timer_handles, lambda handle: scheduler.cancel_timer_sync("assert_that", handle)),
+        (hass_mocks.state_listeners.handles, hass_mocks.state_listeners.cancel),
+        (hass_mocks.event_bus.handles, hass_mocks.event_bus.cancel),
+    ]
+    handles_before = [set(handles()) for handles, _ in registries]
+    try:
+        run_initialize(automation)
+    finally:
+        for (handles, cancel), before in zip(registries, handles_before):
+            for handle in handles():
+                if handle not in before:
+                    cancel(handle)
+
 
 class ListensToWrapper:
-    def __init__(self, automation_thing_to_check, hass_functions):
+    def __init__(self, automation_thing_to_check, hass_functions, hass_mocks):
         self.automation_thing_to_check = automation_thing_to_check
+        self._hass_mocks = hass_mocks
         self.listen_event = hass_functions['listen_event']
         self.listen_state = hass_functions['listen_state']
 
@@ -166,7 +387,8 @@ class ListensToWrapper:
 
         class WithCallbackWrapper:
             def with_callback(self, callback):
-                listens_to_wrapper.automation_thing_to_check.initialize()
+                _run_initialize_again(
+                    listens_to_wrapper.automation_thing_to_check, listens_to_wrapper._hass_mocks)
                 listens_to_wrapper.listen_event.assert_any_call(
                     callback,
                     event,
@@ -179,7 +401,8 @@ class ListensToWrapper:
 
         class WithCallbackWrapper:
             def with_callback(self, callback):
-                listens_to_wrapper.automation_thing_to_check.initialize()
+                _run_initialize_again(
+                    listens_to_wrapper.automation_thing_to_check, listens_to_wrapper._hass_mocks)
                 listens_to_wrapper.listen_state.assert_any_call(
                     callback,
                     entity_id,
@@ -189,8 +412,9 @@ class ListensToWrapper:
 
 
 class RegisteredWrapper:
-    def __init__(self, automation_thing_to_check, hass_functions):
+    def __init__(self, automation_thing_to_check, hass_functions, hass_mocks):
         self.automation_thing_to_check = automation_thing_to_check
+        self._hass_mocks = hass_mocks
         self._run_daily = hass_functions['run_daily']
         self._run_mintely = hass_functions['run_minutely']
         self._run_at = hass_functions['run_at']
@@ -201,7 +425,8 @@ class RegisteredWrapper:
 
         class WithCallbackWrapper:
             def with_callback(self, callback):
-                registered_wrapper.automation_thing_to_check.initialize()
+                _run_initialize_again(
+                    registered_wrapper.automation_thing_to_check, registered_wrapper._hass_mocks)
                 registered_wrapper._run_daily.assert_any_call(
                     callback,
                     time_,
@@ -214,7 +439,8 @@ class RegisteredWrapper:
 
         class WithCallbackWrapper:
             def with_callback(self, callback):
-                registered_wrapper.automation_thing_to_check.initialize()
+                _run_initialize_again(
+                    registered_wrapper.automation_thing_to_check, registered_wrapper._hass_mocks)
                 registered_wrapper._run_mintely.assert_any_call(
                     callback,
                     time_,
@@ -227,7 +453,8 @@ class RegisteredWrapper:
 
         class WithCallbackWrapper:
             def with_callback(self, callback):
-                registered_wrapper.automation_thing_to_check.initialize()
+                _run_initialize_again(
+                    registered_wrapper.automation_thing_to_check, registered_wrapper._hass_mocks)
                 registered_wrapper._run_at.assert_any_call(
                     callback,
                     time_,
@@ -255,16 +482,20 @@ class AssertThatWrapper:
         # Access the `_hass_functions` through private member for now to avoid genearting deprecation
         # warnings while keeping compatibility.
         self.hass_functions = hass_mocks._hass_functions
+        self._hass_mocks = hass_mocks
+        self._call_indexes = _CallIndexes(self.hass_functions)
         self._was = None
         self._was_not = None
         self._listens_to = None
         self._registered = None
 
     def __call__(self, thing_to_check):
-        self._was = WasWrapper(thing_to_check, self.hass_functions)
+        self._was = WasWrapper(thing_to_check, self.hass_functions, self._call_indexes)
         self._was_not = WasNotWrapper(self.was)
-        self._listens_to = ListensToWrapper(thing_to_check, self.hass_functions)
-        self._registered = RegisteredWrapper(thing_to_check, self.hass_functions)
+        self._listens_to = ListensToWrapper(
+            thing_to_check, self.hass_functions, self._hass_mocks)
+        self._registered = RegisteredWrapper(
+            thing_to_check, self.hass_functions, self._hass_mocks)
         return self
 
     @property
@@ -283,11 +514,3 @@ class AssertThatWrapper:
     def registered(self):
         return _ensure_init(self._registered)
 
-
-def _capture_assert_failure_exception(function_with_assertion):
-    """ Returns wether the assertion was successful or not. But does not throw """
-    try:
-        function_with_assertion()
-        return None
-    except AssertionError as failed_assert:
-        return failed_assert
@@ -4,37 +4,49 @@ from inspect import isfunction, signature
 import pytest
 from appdaemon.plugins.hass.hassapi import Hass
 
-from appdaemontestframework.common import AppdaemonTestFrameworkError
+from appdaemontestframework.common import AppdaemonTestFrameworkError, run_initialize
 
 
 class AutomationFixtureError(AppdaemonTestFrameworkError):
     pass
 
 
+# Automation classes which already passed `ensure_automation_is_valid()`
+_validated_automation_classes = set()
+# `AppConfig` of each automation class, copied for every new automation
+_app_config_templates = {}
+
+
 def _instantiate_and_initialize_automation(
     function, automation_class, given_that, hass_functions, hass_mocks
 ):
-    from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon
-    from appdaemon.models.config.app import AppConfig
-
     _inject_helpers_and_call_function(function, given_that, hass_functions, hass_mocks)
 
-    # Create mock AppDaemon and AppConfig for new Appdaemon version
-    mock_ad = MockAppDaemon()
-    mock_config = AppConfig(
-        name=automation_class.__name__,
-        module=automation_class.__module__,
-        **{
-            "class": automation_class.__name__
-        },  # 'class' is a Python keyword, so we use dict unpacking
-    )
-
-    automation = automation_class(mock_ad, mock_config)
-    automation.initialize()
+    # The automation shares the `MockAppDaemon` (and its scheduler) of `hass_mocks`
+    automation = automation_class(hass_mocks.AD, app_config_for(automation_class))
+    run_initialize(automation)
     given_that.mock_functions_are_cleared()
     return automation
 
 
+def app_config_for(automation_class, **overrides):
+    """
+    `AppConfig` for an automation class, as needed by new Appdaemon versions.
+    Built once per class, then returned as a (shallow) copy with `overrides` applied.
+    """
+    if automation_class not in _app_config_templates:
+        from appdaemon.models.config.app import AppConfig
+
+        _app_config_templates[automation_class] = AppConfig(
+            name=automation_class.__name__,
+            module=automation_class.__module__,
+            **{
+                "class": automation_class.__name__
+            },  # 'class' is a Python keyword, so we use dict unpacking
+        )
+    return _app_config_templates[automation_class].model_copy(update=overrides)
+
+
 def _inject_helpers_and_call_function(function, given_that, hass_functions, hass_mocks):
     injectable_fixtures = {
         "given_that": given_that,
@@ -66,8 +78,11 @@ def _inject_helpers_and_call_function(function, given_that, hass_functions, hass
 
 
 def ensure_automation_is_valid(automation_class):
+    if automation_class in _validated_automation_classes:
+        return
+
     def function_exist_in_automation_class(func_name):
-        return func_name in dir(automation_class)
+        return hasattr(automation_class, func_name)
 
     def function_has_arguments_other_than_self(func_name):
         func_parameters = signature(getattr(automation_class, func_name)).parameters
@@ -96,6 +111,7 @@ def ensure_automation_is_valid(automation_class):
         raise AutomationFixtureError(
             f"'{automation_class.__name__}' should be a subclass of 'Hass'"
         )
+    _validated_automation_classes.add(automation_class)
 
 
 class _AutomationFixtureDecoratorWithoutArgs:
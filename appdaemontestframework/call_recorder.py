@@ -0,0 +1,156 @@
+import mock
+
+
+class CallRecorder:
+    """
+    Lightweight replacement for a `MagicMock` standing for a function.
+
+    Calls are stored in an append-only list of `(args, kwargs)` tuples,
+    without creating any `call` object or child mock, while still supporting
+    the `Mock` API used by the helpers and by most tests:
+    `assert_any_call`, `assert_called_with`, `call_args_list`, `side_effect`,
+    `return_value`, `reset_mock`, ...
+    """
+
+    def __init__(self, name, side_effect=None, return_value=None):
+        self._name = name
+        self.calls = []
+        self.side_effect = side_effect
+        self.return_value = return_value
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        side_effect = self.side_effect
+        if side_effect is None:
+            return self.return_value
+        if isinstance(side_effect, BaseException) or (
+            isinstance(side_effect, type) and issubclass(side_effect, BaseException)
+        ):
+            raise side_effect
+        if callable(side_effect):
+            result = side_effect(*args, **kwargs)
+            return self.return_value if result is mock.DEFAULT else result
+        if not hasattr(side_effect, "__next__"):
+            self.side_effect = side_effect = iter(side_effect)
+        result = next(side_effect)
+        if isinstance(result, BaseException) or (
+            isinstance(result, type) and issubclass(result, BaseException)
+        ):
+            raise result
+        return result
+
+    ### Recorded calls
+    @property
+    def call_count(self):
+        return len(self.calls)
+
+    @property
+    def called(self):
+        return bool(self.calls)
+
+    # Like in `MagicMock`, `call_args` are `(args, kwargs)` pairs, and `mock_calls`
+    # are `(name, args, kwargs)` triples
+    @property
+    def call_args(self):
+        if not self.calls:
+            return None
+        return mock.mock._Call(self.calls[-1], two=True)
+
+    @property
+    def call_args_list(self):
+        return [mock.mock._Call(call, two=True) for call in self.calls]
+
+    @property
+    def mock_calls(self):
+        return [mock.call(*args, **kwargs) for args, kwargs in self.calls]
+
+    def reset_mock(self, return_value=False, side_effect=False):
+        self.calls = []
+        if return_value:
+            self.return_value = None
+        if side_effect:
+            self.side_effect = None
+
+    ### Assertions
+    def has_been_called_with(self, *args, **kwargs):
+        """Returns whether at least one recorded call matches the given arguments"""
+        return any(
+            args == call_args and kwargs == call_kwargs
+            for call_args, call_kwargs in self.calls
+        )
+
+    def assert_any_call(self, *args, **kwargs):
+        if not self.has_been_called_with(*args, **kwargs):
+            raise AssertionError(
+                "%s call not found" % self._format_call(args, kwargs)
+            )
+
+    def assert_called_with(self, *args, **kwargs):
+        if not self.calls:
+            raise AssertionError(
+                "expected call not found.\nExpected: %s\n  Actual: not called."
+                % self._format_call(args, kwargs)
+            )
+        actual_args, actual_kwargs = self.calls[-1]
+        if not (args == actual_args and kwargs == actual_kwargs):
+            raise AssertionError(
+                "expected call not found.\nExpected: %s\n  Actual: %s"
+                % (
+                    self._format_call(args, kwargs),
+                    self._format_call(actual_args, actual_kwargs),
+                )
+            )
+
+    def assert_called_once_with(self, *args, **kwargs):
+        self.assert_called_once()
+        self.assert_called_with(*args, **kwargs)
+
+    def assert_called(self):
+        if not self.calls:
+            raise AssertionError(
+                "Expected '%s' to have been called." % self._name
+            )
+
+    def assert_called_once(self):
+        if len(self.calls) != 1:
+            raise AssertionError(
+                "Expected '%s' to have been called once. Called %s times."
+                % (self._name, len(self.calls))
+            )
+
+    def assert_not_called(self):
+        if self.calls:
+            raise AssertionError(
+                "Expected '%s' to not have been called. Called %s times."
+                % (self._name, len(self.calls))
+            )
+
+    def assert_has_calls(self, calls, any_order=False):
+        expected = [(tuple(call.args), dict(call.kwargs)) for call in calls]
+        if any_order:
+            missing = [
+                (args, kwargs)
+                for args, kwargs in expected
+                if not self.has_been_called_with(*args, **kwargs)
+            ]
+            if missing:
+                raise AssertionError(
+                    "%s not all found in call list"
+                    % ", ".join(self._format_call(*call) for call in missing)
+                )
+            return
+        for start in range(len(self.calls) - len(expected) + 1):
+            if self.calls[start : start + len(expected)] == expected:
+                return
+        raise AssertionError(
+            "Calls not found.\nExpected: %s\n  Actual: %s"
+            % (list(calls), self.call_args_list)
+        )
+
+    def _format_call(self, args, kwargs):
+        formatted_args = [repr(arg) for arg in args]
+        formatted_args += ["%s=%r" % item for item in kwargs.items()]
+        return "%s(%s)" % (self._name, ", ".join(formatted_args))
+
+    def __repr__(self):
+        return "<CallRecorder name='%s' calls=%s>" % (self._name, len(self.calls))
@@ -1,2 +1,12 @@
+import inspect
+
+
 class AppdaemonTestFrameworkError(Exception):
     pass
+
+
+def run_initialize(automation):
+    """Call `automation.initialize()`, and run it to completion on the event loop if it is async"""
+    result = automation.initialize()
+    if inspect.iscoroutine(result):
+        automation.AD.sched.sim_event_loop().run_until_complete(result)
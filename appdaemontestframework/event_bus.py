@@ -0,0 +1,177 @@
+import itertools
+
+# Arguments of `listen_event` which are options, not filters on the event data
+_OPTIONS = {'namespace', 'oneshot', 'timeout', 'pin', 'pin_thread'}
+
+
+class EventListener:
+    """A callback registered with `listen_event`"""
+
+    __slots__ = (
+        "handle",
+        "sequence",
+        "callback",
+        "event",
+        "filters",
+        "index_key",
+        "oneshot",
+        "kwargs",
+        "cancelled",
+    )
+
+    def __init__(self, handle, sequence, callback, event, kwargs):
+        self.handle = handle
+        self.sequence = sequence
+        self.callback = callback
+        self.event = event
+        self.filters = {key: value for key, value in kwargs.items() if key not in _OPTIONS}
+        # `(key, value)` of the filter the listener is indexed by, `None` if not indexable
+        self.index_key = next(
+            ((key, value) for key, value in self.filters.items() if _is_hashable(value)),
+            None,
+        )
+        self.oneshot = kwargs.get('oneshot', False)
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def matches(self, data):
+        """Like in AppDaemon, filters on keys missing from the event data are ignored"""
+        return all(
+            key not in data or _matches(expected, data[key])
+            for key, expected in self.filters.items()
+        )
+
+
+def _matches(expected, value):
+    if callable(expected):
+        return expected(value)
+    return expected == value
+
+
+def _is_hashable(value):
+    if callable(value):
+        return False
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class _ListenersOfEvent:
+    """Listeners of one event type, indexed by the value of one of their filters"""
+
+    def __init__(self):
+        # Listeners without any indexable filter
+        self.unindexed = {}
+        # {filter key: {filter value: {handle: listener}}}
+        self.by_filter = {}
+
+    def add(self, listener):
+        if listener.index_key is None:
+            self.unindexed[listener.handle] = listener
+            return
+        key, value = listener.index_key
+        self.by_filter.setdefault(key, {}).setdefault(value, {})[listener.handle] = listener
+
+    def remove(self, listener):
+        if listener.index_key is None:
+            del self.unindexed[listener.handle]
+            return
+        key, value = listener.index_key
+        listeners_by_value = self.by_filter[key]
+        del listeners_by_value[value][listener.handle]
+        if not listeners_by_value[value]:
+            del listeners_by_value[value]
+        if not listeners_by_value:
+            del self.by_filter[key]
+
+    def is_empty(self):
+        return not self.unindexed and not self.by_filter
+
+    def candidates(self, data):
+        """Listeners which might match `data`: only their indexed filter was checked"""
+        candidates = list(self.unindexed.values())
+        for key, listeners_by_value in self.by_filter.items():
+            if key not in data:
+                # The filter is ignored
+                for listeners in listeners_by_value.values():
+                    candidates.extend(listeners.values())
+            elif _is_hashable(data[key]):
+                candidates.extend(listeners_by_value.get(data[key], {}).values())
+            else:
+                for value, listeners in listeners_by_value.items():
+                    if value == data[key]:
+                        candidates.extend(listeners.values())
+        return candidates
+
+
+class EventBus:
+    """
+    Registry of the callbacks registered with `listen_event`, dispatching the events fired
+    by apps (`fire_event`) and by tests (`given_that.event_fired`) to them.
+
+    Listeners are indexed by event type, then by the value of one of their filters
+    (eg. `entity_id`), so firing an event only looks at the listeners that can match it.
+    """
+
+    def __init__(self, scheduler):
+        """
+        :param scheduler: `MockScheduler` on which async callbacks run
+        """
+        self._scheduler = scheduler
+        self._sequence = itertools.count(1)
+        self._listeners_by_handle = {}
+        # By event type, `None` for the listeners of every event
+        self._listeners_by_event = {}
+
+    ### Implement `listen_event`, `cancel_listen_event` and `fire_event`
+    def listen(self, callback, event=None, **kwargs):
+        """Register `callback` and return its handle, or a list of handles for a list of events"""
+        if isinstance(event, (list, tuple)):
+            return [self.listen(callback, each_event, **kwargs) for each_event in event]
+
+        sequence = next(self._sequence)
+        listener = EventListener(f"event-{sequence}", sequence, callback, event, kwargs)
+        self._listeners_by_handle[listener.handle] = listener
+        self._listeners_by_event.setdefault(event, _ListenersOfEvent()).add(listener)
+        return listener.handle
+
+    def cancel(self, handle, *_args, **_kwargs):
+        """Unregister the listener of `handle`"""
+        listener = self._listeners_by_handle.pop(handle, None)
+        if listener is None:
+            return False
+        listener.cancelled = True
+        listeners_of_event = self._listeners_by_event[listener.event]
+        listeners_of_event.remove(listener)
+        if listeners_of_event.is_empty():
+            del self._listeners_by_event[listener.event]
+        return True
+
+    def handles(self):
+        """Handles of the registered listeners"""
+        return list(self._listeners_by_handle)
+
+    def fire(self, event, namespace=None, **data):
+        """Call the listeners of `event` whose filters match `data`"""
+        for listener in self.listeners_of(event, data):
+            if listener.cancelled:
+                # Cancelled by a listener called before
+                continue
+            if listener.oneshot:
+                self.cancel(listener.handle)
+            self._scheduler._run_callback(listener.callback, event, data, listener.kwargs)
+
+    ### Lookup
+    def listeners_of(self, event, data):
+        """Listeners matching `event` and `data`, in the order they were registered"""
+        listeners = []
+        for target in (event, None):
+            listeners_of_event = self._listeners_by_event.get(target)
+            if listeners_of_event is not None:
+                listeners.extend(
+                    listener for listener in listeners_of_event.candidates(data)
+                    if listener.matches(data))
+        listeners.sort(key=lambda listener: listener.sequence)
+        return listeners
@@ -1,7 +1,19 @@
-from datetime import datetime
+from contextlib import contextmanager
+from copy import deepcopy
+from datetime import datetime, timedelta
+
+import mock
 
 from appdaemontestframework.common import AppdaemonTestFrameworkError
 from appdaemontestframework.hass_mocks import HassMocks
+from appdaemontestframework.mocked_states import (
+    DEFAULT_HISTORY_CAPACITY,
+    MockedStates,
+    as_hass_state,
+    format_time,
+)
+from appdaemontestframework.service_handlers import ServiceHandlers, entity_ids_of, normalize_service
+from appdaemontestframework.states_dump import load_states_dump
 
 
 class StateNotSetError(AppdaemonTestFrameworkError):
@@ -17,27 +29,45 @@ class AttributeNotSetError(AppdaemonTestFrameworkError):
     pass
 
 
+class HistoryNotRecordedError(AppdaemonTestFrameworkError):
+    def __init__(self):
+        super().__init__("""
+        The history of the states is not recorded!
+        Please call `given_that.state_history_is_recorded()` before the states change
+        to use `get_history`
+        """)
+
+
 class GivenThatWrapper:
-    def __init__(self, hass_mocks: HassMocks):
+    def __init__(self, hass_mocks: HassMocks, simulate_service_calls=False):
+        """
+        :param simulate_service_calls: If `True`, the common services (`turn_on`, `turn_off`,
+        `toggle`, `media_player/volume_set`, ...) update the mocked states, see
+        `service_handlers.BUILT_IN_HANDLERS`.
+        """
         self._hass_mocks = hass_mocks
+        # `[old state, new state]` by entity_id of the changes made in
+        # `states_change_at_once()`, `None` outside of it
+        self._pending_state_changes = None
+        # Capacity of the history of each entity, `None` if not recorded
+        self._history_capacity = None
         self._init_mocked_states()
         self._init_mocked_passed_args()
+        self._init_service_handlers(simulate_service_calls)
 
     def _init_mocked_states(self):
-        self.mocked_states = {}
+        self.mocked_states = MockedStates(clock=self._hass_mocks.AD.sched.get_now_ts_sync)
+        if self._history_capacity is not None:
+            self._record_state_history()
 
-        def get_state_mock(entity_id=None, *, attribute=None):
+        def get_state_mock(entity_id=None, *, attribute=None, copy=True):
             if entity_id is None:
-                resdict = dict()
-                for entityid in self.mocked_states:
-                    state = self.mocked_states[entityid]
-                    resdict.update({
-                        entityid: {
-                            "state": state['main'],
-                            "attributes": state['attributes']
-                        }
-                    })
-                return resdict
+                return self.mocked_states.full_state_view()
+            elif '.' not in entity_id:
+                if attribute is not None:
+                    raise ValueError(
+                        "Querying a specific attribute is only possible for a single entity")
+                return self.mocked_states.domain_view(entity_id)
             else:
                 if entity_id not in self.mocked_states:
                     raise StateNotSetError(entity_id)
@@ -45,21 +75,18 @@ class GivenThatWrapper:
                 state = self.mocked_states[entity_id]
 
                 if attribute is None:
-                    return state['main']
+                    value = state['main']
                 elif attribute == 'all':
-                    def format_time(timestamp: datetime):
-                        if not timestamp: return None
-                        return timestamp.isoformat()
-
-                    return {
-                        "last_updated": format_time(state['last_updated']),
-                        "last_changed": format_time(state['last_changed']),
-                        "state": state["main"],
-                        "attributes": state['attributes'],
-                        "entity_id": entity_id,
-                    }
+                    value = as_hass_state(entity_id, state)
+                    if copy:
+                        # Only the attributes can be shared with other states, or tests
+                        value['attributes'] = deepcopy(value['attributes'])
+                    return value
+                elif attribute in ('last_updated', 'last_changed'):
+                    return format_time(state[attribute])
                 else:
-                    return state['attributes'].get(attribute)
+                    value = state['attributes'].get(attribute)
+                return _copy_of(value) if copy else value
 
         self._hass_mocks.hass_functions['get_state'].side_effect = get_state_mock
 
@@ -68,6 +95,92 @@ class GivenThatWrapper:
 
         self._hass_mocks.hass_functions['entity_exists'].side_effect = entity_exists_mock
 
+        def get_history_mock(entity_id=None, days=None, start_time=None, end_time=None, **_kwargs):
+            if not self.mocked_states.history_is_recorded:
+                raise HistoryNotRecordedError()
+            sched = self._hass_mocks.AD.sched
+
+            def as_naive(date_time):
+                return sched.make_naive(sched.convert_naive(date_time))
+
+            end_time = sched.get_now_naive_sync() if end_time is None else as_naive(end_time)
+            if start_time is not None:
+                start_time = as_naive(start_time)
+            else:
+                start_time = end_time - timedelta(days=1 if days is None else days)
+
+            if entity_id is None:
+                entity_ids = self.mocked_states.entities_with_history()
+            else:
+                entity_ids = [entity_id]
+
+            history = []
+            for each_entity_id in entity_ids:
+                entries = _entries_between(
+                    self.mocked_states.history_of(each_entity_id), start_time, end_time)
+                if entries:
+                    history.append([
+                        _history_entry_as_hass_state(each_entity_id, entry, sched)
+                        for entry in entries
+                    ])
+            return history
+
+        self._hass_mocks.hass_functions['get_history'].side_effect = get_history_mock
+
+    def _init_service_handlers(self, simulate_service_calls):
+        self.service_handlers = ServiceHandlers()
+        if simulate_service_calls:
+            self.service_handlers.register_built_in_handlers()
+
+        # The side effects return `mock.DEFAULT`, so the mocks still return
+        # the `return_value` a test may configure
+        def call_service_mock(service, **data):
+            service = normalize_service(service)
+            data = dict(data)
+            for entity_id in entity_ids_of(data.pop('entity_id', None)):
+                handler = self.service_handlers.handler_of(service, entity_id)
+                if handler is not None:
+                    self._apply_service_handler(handler, entity_id, data)
+            return mock.DEFAULT
+
+        def turn_on_mock(entity_id, **data):
+            return call_service_mock(
+                f"{entity_id.split('.', 1)[0]}/turn_on", entity_id=entity_id, **data)
+
+        def turn_off_mock(entity_id, **data):
+            return call_service_mock(
+                f"{entity_id.split('.', 1)[0]}/turn_off", entity_id=entity_id, **data)
+
+        hass_functions = self._hass_mocks.hass_functions
+        hass_functions['call_service'].side_effect = call_service_mock
+        hass_functions['turn_on'].side_effect = turn_on_mock
+        hass_functions['turn_off'].side_effect = turn_off_mock
+
+    def _apply_service_handler(self, handler, entity_id, data):
+        """Update the state of `entity_id` with `handler`, then call the matching state listeners"""
+        old_state = self.mocked_states.get(entity_id)
+        if old_state is None:
+            new_state = {'main': None, 'attributes': {}, 'last_updated': None, 'last_changed': None}
+        else:
+            # Never modify the state in place: It can be shared with other tests.
+            # The times are stamped again once the handler updated the state.
+            new_state = {**old_state,
+                         'attributes': dict(old_state['attributes']),
+                         'last_updated': None,
+                         'last_changed': None}
+        handler(new_state, data)
+        self.mocked_states[entity_id] = new_state
+        self._state_changed(entity_id, old_state, new_state)
+
+    def _state_changed(self, entity_id, old_state, new_state):
+        """Call the matching state listeners now, or at the end of `states_change_at_once()`"""
+        if self._pending_state_changes is None:
+            self._hass_mocks.state_listeners.dispatch(entity_id, old_state, new_state)
+        elif entity_id in self._pending_state_changes:
+            self._pending_state_changes[entity_id][1] = new_state
+        else:
+            self._pending_state_changes[entity_id] = [old_state, new_state]
+
     def _init_mocked_passed_args(self):
         self.mocked_passed_args = self._hass_mocks.hass_functions['args']
         self.mocked_passed_args.clear()
@@ -90,8 +203,104 @@ class GivenThatWrapper:
                     'last_changed': last_changed
                 }
 
+            def changes_to(self,
+                           state,
+                           attributes=None,
+                           last_updated: datetime = None,
+                           last_changed: datetime = None):
+                """
+                Same as `is_set_to`, then call the `listen_state` callbacks matching the change.
+                The current attributes are kept if `attributes` is not given.
+                """
+                mocked_states = given_that_wrapper.mocked_states
+                old_state = mocked_states.get(entity_id)
+                if attributes is None:
+                    attributes = dict(old_state['attributes']) if old_state else {}
+                new_state = {
+                    'main': state,
+                    'attributes': attributes,
+                    'last_updated': last_updated,
+                    'last_changed': last_changed
+                }
+                mocked_states[entity_id] = new_state
+                given_that_wrapper._state_changed(entity_id, old_state, new_state)
+
         return IsWrapper()
 
+    def states_of_domain(self, domain):
+        """
+        Set the state of every entity of `domain` at once, eg. `given_that.states_of_domain('light')`.
+        Only the entities whose state is already set are affected.
+        """
+        given_that_wrapper = self
+
+        class AreWrapper:
+            def are_set_to(self,
+                           state,
+                           attributes=None,
+                           last_updated: datetime = None,
+                           last_changed: datetime = None):
+                mocked_states = given_that_wrapper.mocked_states
+                for entity_id in mocked_states.entities_of_domain(domain):
+                    mocked_states[entity_id] = {
+                        'main': state,
+                        'attributes': dict(attributes or {}),
+                        'last_updated': last_updated,
+                        'last_changed': last_changed
+                    }
+
+        return AreWrapper()
+
+    @contextmanager
+    def states_change_at_once(self):
+        """
+        Context manager applying every state change made inside (`changes_to`, simulated
+        service calls) first, then calling the state listeners in a single pass, so they
+        all see the final states. An entity changing several times is dispatched once,
+        from its state before the block to its state after.
+        If the block raises, no listener is called.
+        """
+        if self._pending_state_changes is not None:
+            # Already inside `states_change_at_once()`, changes are dispatched at its end
+            yield
+            return
+
+        self._pending_state_changes = {}
+        try:
+            yield
+            pending_state_changes = self._pending_state_changes
+        finally:
+            self._pending_state_changes = None
+        self._hass_mocks.state_listeners.dispatch_all(
+            (entity_id, old_state, new_state)
+            for entity_id, (old_state, new_state) in pending_state_changes.items())
+
+    def states_change_to(self, states):
+        """
+        Change the states of several entities at once, see `states_change_at_once()`.
+        :param states: By entity_id, the new state, or a `(state, attributes)` tuple
+        """
+        with self.states_change_at_once():
+            for entity_id, state in states.items():
+                if isinstance(state, tuple):
+                    self.state_of(entity_id).changes_to(*state)
+                else:
+                    self.state_of(entity_id).changes_to(state)
+
+    def states_are_loaded_from(self, path_or_states):
+        """
+        Set the states of all the entities of a Home Assistant states dump at once.
+        `path_or_states` is the path of a JSON file with the response of `/api/states`,
+        or the states themselves (list, or dict by entity_id).
+        The states are not copied: They are shared with the other tests loading
+        the same file, and only the entities set afterwards are copied.
+        """
+        self.mocked_states.add_base(load_states_dump(path_or_states))
+
+    def event_fired(self, event, **data):
+        """Simulate `event` being fired with `data`: call the matching `listen_event` callbacks"""
+        self._hass_mocks.event_bus.fire(event, **data)
+
     def passed_arg(self, argument_key):
         given_that_wrapper = self
 
@@ -103,6 +312,34 @@ class GivenThatWrapper:
 
         return IsWrapper()
 
+    def service(self, service):
+        """Simulate the effect of `service` ('DOMAIN/SERVICE') on the mocked states"""
+        given_that_wrapper = self
+
+        class IsHandledByWrapper:
+            @staticmethod
+            def is_handled_by(handler):
+                """
+                `handler(state, data)` updates in place the mocked `state` of each
+                entity the service is called for. `data` is the data of the service call.
+                """
+                given_that_wrapper.service_handlers.register(service, handler)
+
+        return IsHandledByWrapper()
+
+    def state_history_is_recorded(self, capacity=DEFAULT_HISTORY_CAPACITY):
+        """
+        Record from now on the states each entity goes through, at the simulated time,
+        for `get_history` and `given_that.mocked_states.history_of(ENTITY_ID)`.
+        Only the last `capacity` states of each entity are kept.
+        """
+        self._history_capacity = capacity
+        self._record_state_history()
+
+    def _record_state_history(self):
+        self.mocked_states.record_history(
+            self._hass_mocks.AD.sched.get_now_naive_sync, self._history_capacity)
+
     def time_is(self, time_as_datetime):
         self._hass_mocks.AD.sched.sim_set_start_time(time_as_datetime)
 
@@ -114,3 +351,36 @@ class GivenThatWrapper:
             self._init_mocked_states()
         if clear_mock_passed_args:
             self._init_mocked_passed_args()
+
+
+def _copy_of(value):
+    """Deep copy of a state or attribute value, like AppDaemon `get_state(copy=True)`"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return deepcopy(value)
+
+
+def _entries_between(entries, start_time, end_time):
+    """
+    History entries between `start_time` and `end_time`. Like in Home Assistant, the
+    first entry is the state at `start_time`.
+    """
+    entries_between = []
+    for entry in entries:
+        if entry.time > end_time:
+            break
+        if entry.time <= start_time:
+            entries_between = [entry]
+        else:
+            entries_between.append(entry)
+    return entries_between
+
+
+def _history_entry_as_hass_state(entity_id, entry, sched):
+    changed_at = sched.convert_naive(entry.time)
+    return as_hass_state(entity_id, {
+        'main': entry.state,
+        'attributes': entry.attributes,
+        'last_updated': changed_at,
+        'last_changed': changed_at,
+    })
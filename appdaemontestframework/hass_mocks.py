@@ -5,8 +5,13 @@ import appdaemon
 import asyncio
 import threading
 import datetime
+import functools
 from packaging.version import Version
 from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon
+from appdaemontestframework.appdaemon_mock.event_loop import VirtualTimeEventLoop, current_app_task
+from appdaemontestframework.call_recorder import CallRecorder
+from appdaemontestframework.event_bus import EventBus
+from appdaemontestframework.state_listeners import StateListeners
 from appdaemon.plugins.hass.hassapi import Hass
 
 _hass_instances = []
@@ -67,48 +72,17 @@ class AsyncSpyMockHandler(object):
         self.function_or_field_name = function_name
         self.mock_scheduler_method = mock_scheduler_method
 
-        # Create a wrapper that does both: tracks the call AND executes our logic
-        def async_side_effect(mock_self, *args, **kwargs):
-            # The first argument is the mock itself when using side_effect
-            # Let the mock record the call normally first
-            # We can't use _mock_call directly, so we'll manually track
-            if not hasattr(mock_self, "call_count"):
-                mock_self.call_count = 0
-            if not hasattr(mock_self, "call_args_list"):
-                mock_self.call_args_list = []
-
-            mock_self.call_count += 1
-            call_obj = mock.call(*args, **kwargs)
-            mock_self.call_args = call_obj
-            mock_self.call_args_list.append(call_obj)
-
-            # Now execute our custom logic
-            method_args = args
-
+        # The autospecced mock records the call, this side effect only
+        # executes our logic. `hass_self` is the `Hass` instance called.
+        def async_side_effect(hass_self, *args, **kwargs):
             # Delegate to our mock scheduler method if provided
             if self.mock_scheduler_method:
-                # Pass None as hass_self since our mock_scheduler_method will find the real instance
-                result = self.mock_scheduler_method(None, *method_args, **kwargs)
-            else:
-                # For methods without custom implementation, return a suitable default
-                if function_name in [
-                    "run_in",
-                    "run_at",
-                    "run_daily",
-                    "run_hourly",
-                    "run_minutely",
-                    "run_every",
-                    "run_once",
-                ]:
-                    # Return a mock handle for scheduler methods
-                    result = f"mock_handle_{function_name}_{id(method_args)}"
-                else:
-                    result = mock_self.return_value
-
-            return result
+                return _awaitable_in_async_apps(
+                    self.mock_scheduler_method(hass_self, *args, **kwargs))
+            return _awaitable_in_async_apps(None)
 
         # Set up the patch with our wrapper as side_effect and autospec=True
-        # so that mock_self is passed as first argument
+        # so that the `Hass` instance is passed as first argument
         self.patch = mock.patch.object(
             object_to_patch,
             function_name,
@@ -117,16 +91,47 @@ class AsyncSpyMockHandler(object):
         )
         self.mock = self.patch.start()
 
+    def reset(self, mock_scheduler_method=None):
+        """Forget recorded calls and delegate to `mock_scheduler_method` from now on"""
+        self.mock.reset_mock()
+        self.mock_scheduler_method = mock_scheduler_method
+
+
+# Mock handlers shared by all the `HassMocks(share_patches=True)`, by patched
+# object and function name. They stay patched until `stop_shared_patches()`.
+_shared_mock_handlers = {}
+
+
+def stop_shared_patches():
+    """Stops the patches shared between `HassMocks(share_patches=True)` instances"""
+    for mock_handler in _shared_mock_handlers.values():
+        mock_handler.patch.stop()
+    _shared_mock_handlers.clear()
+
 
 class HassMocks:
-    def __init__(self):
+    def __init__(self, share_patches=False, use_call_recorders=False):
+        """
+        :param share_patches: If `True`, `Hass` is only patched by the first
+        `HassMocks` and every following `HassMocks` only resets the recorded
+        calls and the behavior of the existing mocks. Patches then stay in
+        place until `stop_shared_patches()` is called.
+        :param use_call_recorders: If `True`, the most called functions
+        (services, states, listeners, ...) record their calls in a compact
+        `CallRecorder` instead of a `MagicMock`.
+        """
         _DeprecatedAndUnsupportedAppdaemonCheck.show_warning_only_once()
+        self._share_patches = share_patches
         # Mocked out init for Hass class.
         self._hass_instances = []  # list of all hass instances
 
         hass_mocks = self
         AD = MockAppDaemon()
         self.AD = AD
+        # Callbacks registered with `listen_state`, called on state changes
+        self.state_listeners = StateListeners(AD.sched)
+        # Callbacks registered with `listen_event`, called on `fire_event`
+        self.event_bus = EventBus(AD.sched)
 
         def _hass_init_mock(self, _ad, config_model, *_args):
             hass_mocks._hass_instances.append(self)
@@ -142,42 +147,15 @@ class HassMocks:
             self.logger = logging.getLogger(__name__)
 
         # Create async-compatible scheduler method implementations
-        def mock_datetime(hass_self_unused, *args, **kwargs):
+        def mock_datetime(hass_self, *args, **kwargs):
             """Mock implementation of datetime that uses our MockScheduler"""
-            # Find the real automation instance
-            real_automation = None
-            for instance in hass_mocks._hass_instances:
-                if hasattr(instance, "AD") and hasattr(instance.AD, "sched"):
-                    real_automation = instance
-                    break
-
-            if real_automation is None:
-                raise RuntimeError("Could not find real automation instance")
-
-            # Use our mock scheduler to get the current time
-            current_time = real_automation.AD.sched.get_now_sync()
-            # Convert to naive datetime as expected by the automation
-            return real_automation.AD.sched.make_naive(current_time)
-
-        def mock_time(hass_self_unused, *args, **kwargs):
+            return hass_self.AD.sched.get_now_naive_sync()
+
+        def mock_time(hass_self, *args, **kwargs):
             """Mock implementation of time that uses our MockScheduler"""
-            # Find the real automation instance
-            real_automation = None
-            for instance in hass_mocks._hass_instances:
-                if hasattr(instance, "AD") and hasattr(instance.AD, "sched"):
-                    real_automation = instance
-                    break
-
-            if real_automation is None:
-                raise RuntimeError("Could not find real automation instance")
-
-            # Use our mock scheduler to get the current time
-            current_time = real_automation.AD.sched.get_now_sync()
-            # Convert to naive datetime and return just the time part
-            naive_datetime = real_automation.AD.sched.make_naive(current_time)
-            return naive_datetime.time()
-
-        def mock_run_in(hass_self_unused, *args, **kwargs):
+            return hass_self.AD.sched.get_now_naive_sync().time()
+
+        def mock_run_in(hass_self, *args, **kwargs):
             """Mock implementation of run_in that uses our MockScheduler"""
             # Extract callback and delay from args
             # run_in(callback, delay) or run_in(callback, delay, **kwargs)
@@ -194,91 +172,144 @@ class HassMocks:
             else:
                 delay_seconds = float(delay)
 
-            # Find the real automation instance from the hass_instances
-            real_automation = None
-            for instance in hass_mocks._hass_instances:
-                if hasattr(instance, "AD") and hasattr(instance.AD, "sched"):
-                    real_automation = instance
-                    break
-
-            if real_automation is None:
-                raise RuntimeError("Could not find real automation instance")
-
-            # Calculate target time using the real automation's scheduler
-            current_time = real_automation.AD.sched.get_now_sync()
-            target_time = current_time + datetime.timedelta(seconds=delay_seconds)
-
-            # Use our mock scheduler
-            return real_automation.AD.sched.insert_schedule_sync(
+            sched = hass_self.AD.sched
+            target_time = sched.get_now_sync() + datetime.timedelta(seconds=delay_seconds)
+            return sched.insert_schedule_sync(
                 name="run_in",
                 aware_dt=target_time,
-                callback=callback,
+                callback=_with_args(callback, args[2:]),
                 repeat=False,
                 type_="run_in",
                 **kwargs,
             )
 
-        def mock_cancel_timer(hass_self_unused, *args, **kwargs):
+        def mock_cancel_timer(hass_self, *args, **kwargs):
             """Mock implementation of cancel_timer"""
             handle = args[0] if len(args) > 0 else kwargs.get("handle")
+            return hass_self.AD.sched.cancel_timer_sync(
+                name="cancel_timer", handle=handle
+            )
 
-            # Find the real automation instance
-            real_automation = None
-            for instance in hass_mocks._hass_instances:
-                if hasattr(instance, "AD") and hasattr(instance.AD, "sched"):
-                    real_automation = instance
-                    break
+        def schedule_recurring(hass_self, type_, callback, start, interval, args, kwargs):
+            """Queue `callback` in the scheduler of `hass_self` every `interval`"""
+            if isinstance(start, str) and start.startswith("sun"):
+                # Sun events are not simulated, only record the call
+                return None
+            sched = hass_self.AD.sched
+            return sched.insert_schedule_sync(
+                name=type_,
+                aware_dt=sched.get_next_period_sync(interval, start),
+                callback=_with_args(callback, args),
+                repeat=True,
+                type_=type_,
+                interval=interval,
+                **kwargs,
+            )
 
-            if real_automation is None:
-                raise RuntimeError("Could not find real automation instance")
+        def schedule_once(hass_self, type_, callback, start, args, kwargs):
+            """Queue `callback` in the scheduler of `hass_self` at the next `start`"""
+            if isinstance(start, str) and start.startswith("sun"):
+                # Sun events are not simulated, only record the call
+                return None
+            return hass_self.AD.sched.insert_one_off_schedule_sync(
+                name=type_,
+                start=start,
+                callback=_with_args(callback, args),
+                type_=type_,
+                **kwargs,
+            )
 
-            return real_automation.AD.sched.cancel_timer_sync(
-                name="cancel_timer", handle=handle
+        def mock_run_every(hass_self, callback, start=None, interval=0, *args, **kwargs):
+            return schedule_recurring(
+                hass_self, "run_every", callback, start, interval, args, kwargs
+            )
+
+        def mock_run_daily(hass_self, callback, start=None, *args, **kwargs):
+            return schedule_recurring(
+                hass_self,
+                "run_daily",
+                callback,
+                start,
+                datetime.timedelta(days=1),
+                args,
+                kwargs,
+            )
+
+        def mock_run_hourly(hass_self, callback, start=None, *args, **kwargs):
+            return schedule_recurring(
+                hass_self,
+                "run_hourly",
+                callback,
+                start,
+                datetime.timedelta(hours=1),
+                args,
+                kwargs,
             )
 
+        def mock_run_minutely(hass_self, callback, start=None, *args, **kwargs):
+            return schedule_recurring(
+                hass_self,
+                "run_minutely",
+                callback,
+                start,
+                datetime.timedelta(minutes=1),
+                args,
+                kwargs,
+            )
+
+        def mock_run_at(hass_self, callback, start, *args, **kwargs):
+            return schedule_once(hass_self, "run_at", callback, start, args, kwargs)
+
+        def mock_run_once(hass_self, callback, start=None, *args, **kwargs):
+            return schedule_once(hass_self, "run_once", callback, start, args, kwargs)
+
         # This is a list of all mocked out functions.
+        mock_handler = self._mock_handler
+        hot_mock_handler = RecorderMockHandler if use_call_recorders else MockHandler
         self._mock_handlers = [
             ### Meta
             # Patch the __init__ method to skip Hass initialization.
             # Use autospec so we can access the `self` object
-            MockHandler(Hass, "__init__", side_effect=_hass_init_mock, autospec=True),
+            mock_handler(MockHandler, Hass, "__init__", side_effect=_hass_init_mock, autospec=True),
             ### logging
-            MockHandler(Hass, "log", side_effect=self._log_log),
-            MockHandler(Hass, "error", side_effect=self._log_error),
+            mock_handler(MockHandler, Hass, "log", side_effect=self._log_log),
+            mock_handler(MockHandler, Hass, "error", side_effect=self._log_error),
             ### Scheduler callback registrations functions - now with async support
-            AsyncSpyMockHandler(Hass, "run_in", mock_scheduler_method=mock_run_in),
-            MockHandler(Hass, "run_once"),
-            MockHandler(Hass, "run_at"),
-            MockHandler(Hass, "run_daily"),
-            MockHandler(Hass, "run_hourly"),
-            MockHandler(Hass, "run_minutely"),
-            MockHandler(Hass, "run_every"),
-            AsyncSpyMockHandler(
-                Hass, "cancel_timer", mock_scheduler_method=mock_cancel_timer
+            mock_handler(AsyncSpyMockHandler, Hass, "run_in", mock_scheduler_method=mock_run_in),
+            mock_handler(RoutedMockHandler, Hass, "run_once", route=mock_run_once),
+            mock_handler(RoutedMockHandler, Hass, "run_at", route=mock_run_at),
+            mock_handler(RoutedMockHandler, Hass, "run_daily", route=mock_run_daily),
+            mock_handler(RoutedMockHandler, Hass, "run_hourly", route=mock_run_hourly),
+            mock_handler(RoutedMockHandler, Hass, "run_minutely", route=mock_run_minutely),
+            mock_handler(RoutedMockHandler, Hass, "run_every", route=mock_run_every),
+            mock_handler(AsyncSpyMockHandler, Hass, "cancel_timer", mock_scheduler_method=mock_cancel_timer
             ),
             ### Sunrise and sunset functions
-            MockHandler(Hass, "run_at_sunrise"),
-            MockHandler(Hass, "run_at_sunset"),
+            mock_handler(MockHandler, Hass, "run_at_sunrise"),
+            mock_handler(MockHandler, Hass, "run_at_sunset"),
             ### Listener callback registrations functions
-            MockHandler(Hass, "listen_event"),
-            MockHandler(Hass, "listen_state"),
+            mock_handler(hot_mock_handler, Hass, "listen_event", side_effect=self.event_bus.listen),
+            mock_handler(MockHandler, Hass, "cancel_listen_event", side_effect=self.event_bus.cancel),
+            mock_handler(hot_mock_handler, Hass, "listen_state", side_effect=self.state_listeners.listen),
+            mock_handler(MockHandler, Hass, "cancel_listen_state", side_effect=self.state_listeners.cancel),
             ### State functions / attr
-            MockHandler(Hass, "set_state"),
-            MockHandler(Hass, "get_state"),
-            AsyncSpyMockHandler(Hass, "time", mock_scheduler_method=mock_time),
-            AsyncSpyMockHandler(Hass, "datetime", mock_scheduler_method=mock_datetime),
-            DictMockHandler(Hass, "args"),
+            mock_handler(hot_mock_handler, Hass, "set_state"),
+            mock_handler(hot_mock_handler, Hass, "get_state"),
+            mock_handler(MockHandler, Hass, "get_history"),
+            mock_handler(AsyncSpyMockHandler, Hass, "time", mock_scheduler_method=mock_time),
+            mock_handler(AsyncSpyMockHandler, Hass, "datetime", mock_scheduler_method=mock_datetime),
+            mock_handler(DictMockHandler, Hass, "args"),
             ### Interactions functions
-            MockHandler(Hass, "call_service"),
-            MockHandler(Hass, "turn_on"),
-            MockHandler(Hass, "turn_off"),
-            MockHandler(Hass, "fire_event"),
+            mock_handler(hot_mock_handler, Hass, "call_service"),
+            mock_handler(hot_mock_handler, Hass, "turn_on"),
+            mock_handler(hot_mock_handler, Hass, "turn_off"),
+            mock_handler(hot_mock_handler, Hass, "fire_event", side_effect=self._fire_event),
             ### Custom callback functions
-            MockHandler(Hass, "register_constraint"),
-            MockHandler(Hass, "now_is_between"),
-            MockHandler(Hass, "notify"),
+            mock_handler(MockHandler, Hass, "register_constraint"),
+            mock_handler(MockHandler, Hass, "now_is_between"),
+            mock_handler(hot_mock_handler, Hass, "notify"),
             ### Miscellaneous Helper Functions
-            MockHandler(Hass, "entity_exists"),
+            mock_handler(hot_mock_handler, Hass, "entity_exists"),
         ]
 
         # Generate a dictionary of mocked Hass functions for use by older code
@@ -290,9 +321,36 @@ class HassMocks:
                 mock_handler.mock
             )
 
+    def _fire_event(self, event, namespace=None, **data):
+        # Returns `mock.DEFAULT`, so the mock still returns the `return_value` a test may configure
+        self.event_bus.fire(event, namespace, **data)
+        return mock.DEFAULT
+
     ### Mock handling
+    def _mock_handler(self, handler_class, object_to_patch, name, **kwargs):
+        """Create `handler_class(object_to_patch, name, **kwargs)`, or reset the shared one"""
+        if not self._share_patches:
+            return handler_class(object_to_patch, name, **kwargs)
+
+        key = (object_to_patch, name)
+        shared_handler = _shared_mock_handlers.get(key)
+        if type(shared_handler) is handler_class:
+            shared_handler.reset(**kwargs)
+            return shared_handler
+        if shared_handler is not None:
+            # Patched with another kind of handler, eg. before `use_call_recorders` changed
+            shared_handler.patch.stop()
+        shared_handler = _shared_mock_handlers[key] = handler_class(object_to_patch, name, **kwargs)
+        return shared_handler
+
     def unpatch_mocks(self):
-        """Stops all mocks this class handles."""
+        """
+        Stops all mocks this class handles and stops its `MockAppDaemon`.
+        Shared patches are left in place.
+        """
+        self.AD.stop()
+        if self._share_patches:
+            return
         for mock_handler in self._mock_handlers:
             mock_handler.patch.stop()
 
@@ -313,6 +371,47 @@ class HassMocks:
         logging.log(get_logging_level_from_name(level), msg)
 
 
+def _with_args(callback, args):
+    """`callback` called with the extra positional `args` given when registering it, before its kwargs"""
+    if not args:
+        return callback
+    return functools.partial(callback, *args)
+
+
+def _awaitable_in_async_apps(result):
+    """
+    Like in AppDaemon, functions called from async apps (from a task of the
+    event loop of AppDaemon) return a future of their result, to await.
+    Sync apps get the result directly.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return result
+    if not isinstance(loop, VirtualTimeEventLoop) or current_app_task(loop) is None:
+        return result
+    future = loop.create_future()
+    future.set_result(result)
+    return future
+
+
+class _AsyncAppsMagicMock(mock.MagicMock):
+    """`MagicMock` returning a future of its result when called from async apps"""
+
+    def __call__(self, *args, **kwargs):
+        return _awaitable_in_async_apps(super().__call__(*args, **kwargs))
+
+    def _get_child_mock(self, **kwargs):
+        return mock.MagicMock(**kwargs)
+
+
+class _AsyncAppsCallRecorder(CallRecorder):
+    """`CallRecorder` returning a future of its result when called from async apps"""
+
+    def __call__(self, *args, **kwargs):
+        return _awaitable_in_async_apps(super().__call__(*args, **kwargs))
+
+
 class MockHandler:
     """
     A class for generating a mock in an object and holding on to info about it.
@@ -335,13 +434,25 @@ class MockHandler:
         )
         self.mock = self.patch.start()
 
+    def reset(self, side_effect=None, autospec=False):
+        """Forget recorded calls and any behavior configured since patching"""
+        # Autospecced functions only forward call configuration to their mock
+        mock_to_reset = self.mock.mock if autospec else self.mock
+        mock_to_reset.reset_mock(return_value=True, side_effect=True)
+        mock_to_reset.return_value = None
+        mock_to_reset.side_effect = side_effect
+
     def _patch_kwargs(self, side_effect, autospec):
-        return {
+        patch_kwargs = {
             "create": True,
             "side_effect": side_effect,
             "return_value": None,
-            "autospec": autospec,
         }
+        if autospec:
+            patch_kwargs["autospec"] = True
+        else:
+            patch_kwargs["new_callable"] = _AsyncAppsMagicMock
+        return patch_kwargs
 
 
 class DictMockHandler(MockHandler):
@@ -352,10 +463,55 @@ class DictMockHandler(MockHandler):
     def __init__(self, object_to_patch, field_name):
         super().__init__(object_to_patch, field_name)
 
+    def reset(self):
+        self.mock.clear()
+
     def _patch_kwargs(self, _side_effect, _autospec):
         return {"create": True, "new": self.MockDict()}
 
 
+class RecorderMockHandler(MockHandler):
+    """
+    Mock Handler patching the function with a lightweight `CallRecorder`
+    instead of a `MagicMock`. Useful for functions called a lot.
+    """
+
+    def _patch_kwargs(self, side_effect, _autospec):
+        return {
+            "create": True,
+            "new": _AsyncAppsCallRecorder(self.function_or_field_name, side_effect=side_effect),
+        }
+
+
+class RoutedMockHandler(MockHandler):
+    """
+    Mock Handler recording calls exactly like a plain `MockHandler` (without
+    `self`), then forwarding them to `route`.
+    :param route: function called as `route(hass_self, *args, **kwargs)`,
+    `hass_self` being the instance the patched function was called on. Its
+    result is returned to the caller.
+    """
+
+    def __init__(self, object_to_patch, function_name, route):
+        self.function_or_field_name = function_name
+        self.route = route
+        self.mock = mock.MagicMock(name=function_name, return_value=None)
+        handler = self
+
+        def routed_function(hass_self, *args, **kwargs):
+            handler.mock(*args, **kwargs)
+            return _awaitable_in_async_apps(handler.route(hass_self, *args, **kwargs))
+
+        self.patch = mock.patch.object(
+            object_to_patch, function_name, new=routed_function
+        )
+        self.patch.start()
+
+    def reset(self, route):
+        super().reset()
+        self.route = route
+
+
 class SpyMockHandler(MockHandler):
     """
     Mock Handler that provides a Spy. That is, when invoke it will call the
@@ -0,0 +1,350 @@
+import functools
+from collections import deque, namedtuple
+from collections.abc import MutableMapping
+from datetime import datetime, timezone
+
+from appdaemontestframework.states_dump import StatesSnapshot, entities_by_domain
+
+
+def domain_of(entity_id):
+    return entity_id.split('.', 1)[0]
+
+
+def format_time(time):
+    """
+    ISO format of a `last_updated` / `last_changed` time: either a timestamp
+    (seconds since epoch, UTC), or a datetime given by the test.
+    """
+    if time is None:
+        return None
+    if isinstance(time, datetime):
+        return time.isoformat()
+    return _format_timestamp(time)
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_timestamp(timestamp):
+    # States mostly share a few times, eg. the time the test started:
+    # each one is only formatted once.
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def as_hass_state(entity_id, state):
+    """The complete state of `entity_id` as returned by Home Assistant (`get_state(attribute='all')`)"""
+    return {
+        "last_updated": format_time(state['last_updated']),
+        "last_changed": format_time(state['last_changed']),
+        "state": state["main"],
+        "attributes": state['attributes'],
+        "entity_id": entity_id,
+    }
+
+
+DEFAULT_HISTORY_CAPACITY = 1000
+
+HistoryEntry = namedtuple('HistoryEntry', ['time', 'state', 'attributes'])
+
+# Attribute change meaning the attribute was removed
+_REMOVED = object()
+
+
+class StateHistory:
+    """
+    Last states of an entity, in a ring buffer of at most `capacity` entries.
+    Each entry is `(time, state, attribute changes)`, only the attributes of the oldest
+    entry being kept in full.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("The capacity of a state history must be at least 1")
+        self._capacity = capacity
+        self._entries = deque()
+        # Attributes the changes of the oldest entry apply to
+        self._attributes_before_oldest = {}
+        self._last_state = None
+        self._last_attributes = {}
+
+    def record(self, time, state, attributes):
+        """Record a new state, unless the state and attributes did not change"""
+        changes = {
+            key: value for key, value in attributes.items()
+            if self._last_attributes.get(key, _REMOVED) != value
+        }
+        changes.update(
+            (key, _REMOVED) for key in self._last_attributes if key not in attributes)
+        if self._entries and state == self._last_state and not changes:
+            return
+
+        if len(self._entries) == self._capacity:
+            _, _, evicted_changes = self._entries.popleft()
+            _apply_changes(self._attributes_before_oldest, evicted_changes)
+        self._entries.append((time, state, changes))
+        self._last_state = state
+        self._last_attributes = dict(attributes)
+
+    def entries(self):
+        """`HistoryEntry`s, oldest first"""
+        attributes = dict(self._attributes_before_oldest)
+        entries = []
+        for time, state, changes in self._entries:
+            _apply_changes(attributes, changes)
+            entries.append(HistoryEntry(time, state, dict(attributes)))
+        return entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _apply_changes(attributes, changes):
+    for key, value in changes.items():
+        if value is _REMOVED:
+            attributes.pop(key, None)
+        else:
+            attributes[key] = value
+
+
+class MockedStates(MutableMapping):
+    """
+    Mocked states by entity_id, in layers:
+     - Base layers, shared between tests and never modified (eg. states dumps).
+     - An overlay with the states set during the test, on top.
+
+    Setting a state only writes to the overlay, so reusing a large base of
+    states in a new test costs nothing: only the entities set are copied.
+
+    Views of all the states, or of the states of a domain, in the format of
+    `get_state()` are built on first use, then kept up to date on each write.
+    Callers get a snapshot of them, copied once per change of the states.
+
+    With a `clock`, states set without `last_updated` / `last_changed` are stamped
+    with the current time, `last_changed` only if the state itself changed.
+    """
+
+    def __init__(self, clock=None):
+        """
+        :param clock: Function returning the current (simulated) timestamp, in seconds since epoch
+        """
+        self._clock = clock
+        # Most recently added base first
+        self._bases = []
+        self._overlay = {}
+        # Entity ids of the overlay by domain, each kept in an (ordered) dict
+        self._overlay_by_domain = {}
+        # Entities of the bases removed during the test
+        self._deleted = set()
+        self._reset_views()
+        # `StateHistory` by entity_id, `None` while the history is not recorded
+        self._histories = None
+        self._history_clock = None
+        self._history_capacity = DEFAULT_HISTORY_CAPACITY
+        self._history_start = None
+
+    def add_base(self, states):
+        """
+        Put `states` (by entity_id) on top of the existing bases. They replace
+        the states set so far for the same entities. `states` is shared, not copied.
+        """
+        for entity_id in [entity_id for entity_id in self._overlay if entity_id in states]:
+            self._remove_from_overlay(entity_id)
+        self._deleted.difference_update(
+            [entity_id for entity_id in self._deleted if entity_id in states])
+        self._bases.insert(0, states)
+        self._reset_views()
+
+    ### History
+    def record_history(self, clock, capacity=DEFAULT_HISTORY_CAPACITY):
+        """
+        Record from now on the states each entity goes through, keeping the last
+        `capacity` ones per entity.
+        :param clock: Function returning the current (simulated) time, the time of each change
+        """
+        self._history_clock = clock
+        self._history_capacity = capacity
+        self._history_start = clock()
+        self._histories = {}
+
+    @property
+    def history_is_recorded(self):
+        return self._histories is not None
+
+    def history_of(self, entity_id):
+        """
+        `HistoryEntry(time, state, attributes)` of each state of `entity_id` since the
+        history is recorded, oldest first. The state of an entity which did not change
+        is listed at the time the recording started. A deleted entity has a `None` state.
+        """
+        if self._histories is None:
+            return []
+        if entity_id not in self._histories and entity_id not in self:
+            return []
+        return self._history_of(entity_id).entries()
+
+    def entities_with_history(self):
+        """Entities whose state changed since the history is recorded"""
+        if self._histories is None:
+            return []
+        return list(self._histories)
+
+    def _history_of(self, entity_id):
+        """History of `entity_id`, started with its current state if new"""
+        history = self._histories.get(entity_id)
+        if history is None:
+            history = self._histories[entity_id] = StateHistory(self._history_capacity)
+            if entity_id in self:
+                state = self[entity_id]
+                history.record(self._history_start, state['main'], state['attributes'])
+        return history
+
+    def _record_history(self, entity_id, state):
+        history = self._history_of(entity_id)
+        if state is None:
+            history.record(self._history_clock(), None, {})
+        else:
+            history.record(self._history_clock(), state['main'], state['attributes'])
+
+    ### Views
+    def full_state_view(self):
+        """
+        Snapshot `{entity_id: {'state': STATE, 'attributes': ATTRIBUTES}}` of every entity.
+        The same dict is returned until the states change, later changes do not show in it.
+        """
+        if self._full_state_view is None:
+            self._full_state_view = {
+                entity_id: self._view_of(entity_id) for entity_id in self
+            }
+        if self._full_state_snapshot is None:
+            self._full_state_snapshot = dict(self._full_state_view)
+        return self._full_state_snapshot
+
+    def domain_view(self, domain):
+        """Same as `full_state_view()`, only with the entities of `domain`"""
+        if domain not in self._domain_views:
+            self._domain_views[domain] = {
+                entity_id: self._view_of(entity_id)
+                for entity_id in self.entities_of_domain(domain)
+            }
+        if domain not in self._domain_snapshots:
+            self._domain_snapshots[domain] = dict(self._domain_views[domain])
+        return self._domain_snapshots[domain]
+
+    def entities_of_domain(self, domain):
+        """Entity ids of `domain`, found through the domain index of each layer"""
+        candidates = dict(self._overlay_by_domain.get(domain, {}))
+        for base in self._bases:
+            candidates.update(dict.fromkeys(_entities_by_domain_of(base).get(domain, ())))
+        if not self._deleted:
+            return list(candidates)
+        return [entity_id for entity_id in candidates if entity_id not in self._deleted]
+
+    def _add_to_overlay(self, entity_id, state):
+        self._overlay[entity_id] = state
+        self._overlay_by_domain.setdefault(domain_of(entity_id), {})[entity_id] = None
+
+    def _remove_from_overlay(self, entity_id):
+        del self._overlay[entity_id]
+        entities_of_domain = self._overlay_by_domain[domain_of(entity_id)]
+        del entities_of_domain[entity_id]
+        if not entities_of_domain:
+            del self._overlay_by_domain[domain_of(entity_id)]
+
+    def _stamp(self, entity_id, state):
+        if state['last_updated'] is not None and state['last_changed'] is not None:
+            return
+        now = self._clock()
+        if state['last_updated'] is None:
+            state['last_updated'] = now
+        if state['last_changed'] is None:
+            old_state = self.get(entity_id)
+            if old_state is None or old_state['main'] != state['main'] \
+                    or old_state['last_changed'] is None:
+                state['last_changed'] = now
+            else:
+                state['last_changed'] = old_state['last_changed']
+
+    def _view_of(self, entity_id):
+        # The attributes are copied: they can be shared with a base, or the test
+        state = self[entity_id]
+        return {'state': state['main'], 'attributes': dict(state['attributes'])}
+
+    def _reset_views(self):
+        # Views kept up to date, and the snapshots of them returned since the last change
+        self._full_state_view = None
+        self._full_state_snapshot = None
+        self._domain_views = {}
+        self._domain_snapshots = {}
+
+    def _refresh_views_of(self, entity_id):
+        self._full_state_snapshot = None
+        self._domain_snapshots.pop(domain_of(entity_id), None)
+        views = [self._full_state_view, self._domain_views.get(domain_of(entity_id))]
+        for view in views:
+            if view is None:
+                continue
+            if entity_id in self:
+                view[entity_id] = self._view_of(entity_id)
+            else:
+                view.pop(entity_id, None)
+
+    ### Mapping
+    def __getitem__(self, entity_id):
+        if entity_id in self._overlay:
+            return self._overlay[entity_id]
+        if entity_id not in self._deleted:
+            for base in self._bases:
+                if entity_id in base:
+                    return base[entity_id]
+        raise KeyError(entity_id)
+
+    def __contains__(self, entity_id):
+        if entity_id in self._overlay:
+            return True
+        if entity_id in self._deleted:
+            return False
+        return any(entity_id in base for base in self._bases)
+
+    def __setitem__(self, entity_id, state):
+        if self._clock is not None:
+            self._stamp(entity_id, state)
+        if self._histories is not None:
+            self._record_history(entity_id, state)
+        self._add_to_overlay(entity_id, state)
+        self._deleted.discard(entity_id)
+        self._refresh_views_of(entity_id)
+
+    def __delitem__(self, entity_id):
+        if entity_id not in self:
+            raise KeyError(entity_id)
+        if self._histories is not None:
+            self._record_history(entity_id, None)
+        if entity_id in self._overlay:
+            self._remove_from_overlay(entity_id)
+        if any(entity_id in base for base in self._bases):
+            self._deleted.add(entity_id)
+        self._refresh_views_of(entity_id)
+
+    def __iter__(self):
+        yield from self._overlay
+        if not self._bases:
+            return
+        seen = set(self._overlay)
+        seen.update(self._deleted)
+        for base in self._bases:
+            for entity_id in base:
+                if entity_id not in seen:
+                    seen.add(entity_id)
+                    yield entity_id
+
+    def __len__(self):
+        if not self._bases:
+            return len(self._overlay)
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self.items())!r})"
+
+
+def _entities_by_domain_of(base):
+    if isinstance(base, StatesSnapshot):
+        return base.entities_by_domain()
+    return entities_by_domain(base)
@@ -1,5 +1,7 @@
 from pytest import fixture
 from appdaemontestframework import HassMocks, AssertThatWrapper, GivenThatWrapper, TimeTravelWrapper
+from appdaemontestframework.hass_mocks import stop_shared_patches
+from appdaemontestframework.appdaemon_mock.appdaemon import get_shared_event_loop, close_shared_event_loop
 import warnings
 import textwrap
 
@@ -7,6 +9,11 @@ import textwrap
 __all__ = [
     'pytest_plugins',
     'fixture',
+    'appdaemon_event_loop',
+    'share_hass_patches',
+    '_shared_hass_patches',
+    'use_call_recorders',
+    'simulate_service_calls',
     'hass_mocks',
     'hass_functions',
     'given_that',
@@ -30,9 +37,66 @@ class DeprecatedDict(dict):
         return super().__getitem__(key)
 
 
+@fixture(scope='session')
+def appdaemon_event_loop():
+    """
+    Event loop shared by the `MockAppDaemon` of every test of the session.
+    Tasks left on the loop are cancelled at the end of each test, and the loop
+    is closed at the end of the session.
+    """
+    yield get_shared_event_loop()
+    close_shared_event_loop()
+
+
+@fixture(scope='session')
+def share_hass_patches():
+    """
+    Override this fixture in your `conftest.py` and return `True` to patch `Hass`
+    only once per test session (or per worker with `pytest-xdist`).
+    Each test then only resets the recorded calls and the behavior of the mocks,
+    which makes setting up a test much cheaper.
+
+    Note: While the session is running, `Hass` stays patched, even in tests that
+    do not use the `hass_mocks` fixture.
+    """
+    return False
+
+
+@fixture(scope='session')
+def _shared_hass_patches(share_hass_patches):
+    yield share_hass_patches
+    if share_hass_patches:
+        stop_shared_patches()
+
+
+@fixture(scope='session')
+def use_call_recorders():
+    """
+    Override this fixture in your `conftest.py` and return `True` to record the calls
+    of the most used `Hass` functions (services, states, listeners, ...) in a compact
+    `CallRecorder` instead of a `MagicMock`.
+    Useful for load-style tests making a huge number of calls.
+
+    `CallRecorder` supports the usual assertions (`assert_any_call`, `assert_called_with`,
+    `call_args_list`, ...) but not the more exotic parts of the `MagicMock` API.
+    """
+    return False
+
+
+@fixture
+def simulate_service_calls():
+    """
+    Override this fixture and return `True` to have the common services (`turn_on`,
+    `turn_off`, `toggle`, `media_player/volume_set`, ...) update the mocked states
+    and call the matching `listen_state` callbacks, like Home Assistant would.
+    """
+    return False
+
+
 @fixture
-def hass_mocks():
-    hass_mocks = HassMocks()
+def hass_mocks(appdaemon_event_loop, _shared_hass_patches, use_call_recorders):
+    hass_mocks = HassMocks(share_patches=_shared_hass_patches,
+                           use_call_recorders=use_call_recorders)
     yield hass_mocks
     hass_mocks.unpatch_mocks()
 
@@ -43,8 +107,8 @@ def hass_functions(hass_mocks):
 
 
 @fixture
-def given_that(hass_mocks):
-    return GivenThatWrapper(hass_mocks)
+def given_that(hass_mocks, simulate_service_calls):
+    return GivenThatWrapper(hass_mocks, simulate_service_calls=simulate_service_calls)
 
 
 @fixture
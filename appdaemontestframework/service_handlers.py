@@ -0,0 +1,110 @@
+"""
+Handlers simulating the effect of Home Assistant services on the mocked states.
+
+A handler is called as `handler(state, data)` for each entity targeted by the service:
+ - `state`: Mocked state of the entity (`{'main': ..., 'attributes': {...}, ...}`) to
+   update in place. For an entity whose state was never set, `state['main']` is `None`.
+ - `data`: Data of the service call, without `entity_id`.
+"""
+
+# Domain of the services applying to entities of any domain
+_ANY_DOMAIN = 'homeassistant'
+
+# Data of `light/turn_on` which changes how the light turns on, not its attributes
+_LIGHT_TRANSITION_DATA = {'transition', 'flash', 'profile'}
+
+
+### Built-in handlers ################################################
+
+
+def turn_on(state, _data):
+    state['main'] = 'on'
+
+
+def turn_off(state, _data):
+    state['main'] = 'off'
+
+
+def toggle(state, _data):
+    state['main'] = 'off' if state['main'] == 'on' else 'on'
+
+
+def turn_on_light(state, data):
+    state['main'] = 'on'
+    state['attributes'].update(
+        (key, value) for key, value in data.items() if key not in _LIGHT_TRANSITION_DATA)
+
+
+def set_volume(state, data):
+    state['attributes']['volume_level'] = data['volume_level']
+
+
+def mute_volume(state, data):
+    state['attributes']['is_volume_muted'] = data['is_volume_muted']
+
+
+def set_value(state, data):
+    state['main'] = data['value']
+
+
+def select_option(state, data):
+    state['main'] = data['option']
+
+
+BUILT_IN_HANDLERS = {
+    'homeassistant/turn_on': turn_on,
+    'homeassistant/turn_off': turn_off,
+    'homeassistant/toggle': toggle,
+    'light/turn_on': turn_on_light,
+    'media_player/volume_set': set_volume,
+    'media_player/volume_mute': mute_volume,
+    'input_number/set_value': set_value,
+    'input_text/set_value': set_value,
+    'input_select/select_option': select_option,
+}
+
+######################################################################
+
+
+class ServiceHandlers:
+    """
+    Handlers of the services, by 'DOMAIN/SERVICE'.
+    Handlers registered for 'homeassistant/SERVICE' apply to the entities of any domain
+    without a more specific handler.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+
+    def register(self, service, handler):
+        self._handlers[normalize_service(service)] = handler
+
+    def register_built_in_handlers(self):
+        self._handlers.update(BUILT_IN_HANDLERS)
+
+    def handler_of(self, service, entity_id):
+        """Handler of `service` for `entity_id`, `None` if the service is not simulated"""
+        domain, _, service_name = service.partition('/')
+        if domain == _ANY_DOMAIN:
+            # `homeassistant/turn_on` uses the handler of the domain of the entity
+            domain = entity_id.split('.', 1)[0]
+        handler = self._handlers.get(f"{domain}/{service_name}")
+        if handler is None:
+            handler = self._handlers.get(f"{_ANY_DOMAIN}/{service_name}")
+        return handler
+
+
+def normalize_service(service):
+    """'DOMAIN.SERVICE' -> 'DOMAIN/SERVICE'"""
+    if '/' not in service:
+        return service.replace('.', '/', 1)
+    return service
+
+
+def entity_ids_of(entity_id):
+    """Entity ids targeted by the `entity_id` of a service call"""
+    if entity_id is None:
+        return []
+    if isinstance(entity_id, str):
+        return [each_entity_id.strip() for each_entity_id in entity_id.split(',')]
+    return list(entity_id)
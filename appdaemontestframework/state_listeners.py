@@ -0,0 +1,177 @@
+import datetime
+import itertools
+
+from appdaemontestframework.mocked_states import as_hass_state, domain_of
+
+# Value of the `new` / `old` filters when not given
+_ANY = object()
+
+
+class StateListener:
+    """A callback registered with `listen_state`"""
+
+    __slots__ = (
+        "handle",
+        "sequence",
+        "callback",
+        "entity_id",
+        "attribute",
+        "new",
+        "old",
+        "duration",
+        "oneshot",
+        "kwargs",
+        "timer",
+        "cancelled",
+    )
+
+    def __init__(self, handle, sequence, callback, entity_id, kwargs):
+        self.handle = handle
+        self.sequence = sequence
+        self.callback = callback
+        self.entity_id = entity_id
+        self.attribute = kwargs.get('attribute')
+        self.new = kwargs.get('new', _ANY)
+        self.old = kwargs.get('old', _ANY)
+        self.duration = kwargs.get('duration')
+        self.oneshot = kwargs.get('oneshot', False)
+        self.kwargs = kwargs
+        # Handle of the pending `duration` timer
+        self.timer = None
+        self.cancelled = False
+
+    def values(self, entity_id, old_state, new_state):
+        """`(old, new)` values of the state or attribute listened to"""
+        return (self._value(entity_id, old_state), self._value(entity_id, new_state))
+
+    def _value(self, entity_id, state):
+        if state is None:
+            return None
+        if self.attribute is None:
+            return state['main']
+        if self.attribute == 'all':
+            return as_hass_state(entity_id, state)
+        return state['attributes'].get(self.attribute)
+
+    def matches(self, old, new):
+        return _matches(self.old, old) and _matches(self.new, new)
+
+
+def _matches(expected, value):
+    if expected is _ANY:
+        return True
+    if callable(expected):
+        return expected(value)
+    return expected == value
+
+
+class StateListeners:
+    """
+    Registry of the callbacks registered with `listen_state`, dispatching state changes
+    to them like AppDaemon does.
+
+    Listeners are indexed by what they listen to: an entity, a whole domain, or every
+    entity. Dispatching a change of an entity only looks at the listeners of that entity,
+    of its domain, and of every entity.
+    """
+
+    def __init__(self, scheduler):
+        """
+        :param scheduler: `MockScheduler` on which `duration` timers are scheduled,
+        and async callbacks run
+        """
+        self._scheduler = scheduler
+        self._sequence = itertools.count(1)
+        # Listeners by handle, and by entity_id, domain, or `None` for every entity
+        self._listeners_by_handle = {}
+        self._listeners_by_target = {}
+
+    ### Implement `listen_state` and `cancel_listen_state`
+    def listen(self, callback, entity_id=None, **kwargs):
+        """Register `callback` and return its handle, or a list of handles for a list of entities"""
+        if isinstance(entity_id, (list, tuple)):
+            return [self.listen(callback, entity, **kwargs) for entity in entity_id]
+
+        sequence = next(self._sequence)
+        listener = StateListener(f"state-{sequence}", sequence, callback, entity_id, kwargs)
+        self._listeners_by_handle[listener.handle] = listener
+        self._listeners_by_target.setdefault(entity_id, {})[listener.handle] = listener
+        return listener.handle
+
+    def cancel(self, handle, *_args, **_kwargs):
+        """Unregister the listener of `handle`, and cancel its pending `duration` timer"""
+        listener = self._listeners_by_handle.pop(handle, None)
+        if listener is None:
+            return False
+        listener.cancelled = True
+        self._cancel_timer(listener)
+        listeners_of_target = self._listeners_by_target[listener.entity_id]
+        del listeners_of_target[handle]
+        if not listeners_of_target:
+            del self._listeners_by_target[listener.entity_id]
+        return True
+
+    def handles(self):
+        """Handles of the registered listeners"""
+        return list(self._listeners_by_handle)
+
+    ### Dispatch
+    def listeners_of(self, entity_id):
+        """Listeners of the changes of `entity_id`, in the order they were registered"""
+        listeners = []
+        for target in (entity_id, domain_of(entity_id), None):
+            listeners.extend(self._listeners_by_target.get(target, {}).values())
+        listeners.sort(key=lambda listener: listener.sequence)
+        return listeners
+
+    def dispatch(self, entity_id, old_state, new_state):
+        """
+        Call the listeners of `entity_id` whose state or attribute changed from `old_state`
+        to `new_state` (mocked states, `None` if the entity does not exist), and whose
+        `new` / `old` filters match. Listeners with a `duration` are called once the
+        state has stayed the same for `duration`.
+        """
+        for listener in self.listeners_of(entity_id):
+            if listener.cancelled:
+                # Cancelled by a listener called before
+                continue
+            old, new = listener.values(entity_id, old_state, new_state)
+            if old == new:
+                continue
+            # Whatever the new value, it did not stay the same for `duration`
+            self._cancel_timer(listener)
+            if not listener.matches(old, new):
+                continue
+            if listener.duration:
+                self._start_timer(listener, entity_id, old, new)
+            else:
+                self._scheduler._run_callback(self._call, listener, entity_id, old, new)
+
+    def dispatch_all(self, changes):
+        """`dispatch()` each `(entity_id, old_state, new_state)` of `changes`, in order"""
+        for entity_id, old_state, new_state in changes:
+            self.dispatch(entity_id, old_state, new_state)
+
+    def _call(self, listener, entity_id, old, new):
+        if listener.oneshot:
+            self.cancel(listener.handle)
+        return listener.callback(entity_id, listener.attribute, old, new, listener.kwargs)
+
+    def _start_timer(self, listener, entity_id, old, new):
+        def call_listener(_kwargs):
+            listener.timer = None
+            return self._call(listener, entity_id, old, new)
+
+        sched = self._scheduler
+        listener.timer = sched.insert_schedule_sync(
+            name="listen_state",
+            aware_dt=sched.get_now_sync() + datetime.timedelta(seconds=float(listener.duration)),
+            callback=call_listener,
+            repeat=False,
+            type_="listen_state",
+        )
+
+    def _cancel_timer(self, listener):
+        if listener.timer is not None:
+            self._scheduler.cancel_timer_sync(name="listen_state", handle=listener.timer)
+            listener.timer = None
@@ -0,0 +1,138 @@
+import json
+import os
+from datetime import datetime
+
+from appdaemontestframework.common import AppdaemonTestFrameworkError
+
+_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = ' \t\r\n'
+
+# Parsed dump files, shared by all the tests of the session.
+# By `(absolute path, modification time, size)`.
+_parsed_dump_files = {}
+
+
+class StatesDumpError(AppdaemonTestFrameworkError):
+    pass
+
+
+class StatesSnapshot(dict):
+    """States of a states dump, by entity_id, as returned by `load_states_dump()`"""
+
+    def entities_by_domain(self):
+        """Entity ids by domain. Computed once, snapshots are never modified"""
+        if not hasattr(self, '_entities_by_domain'):
+            self._entities_by_domain = entities_by_domain(self)
+        return self._entities_by_domain
+
+
+def entities_by_domain(entity_ids):
+    """Lists of entity ids by domain"""
+    by_domain = {}
+    for entity_id in entity_ids:
+        by_domain.setdefault(entity_id.split('.', 1)[0], []).append(entity_id)
+    return by_domain
+
+
+def load_states_dump(path_or_states):
+    """
+    Returns the states of a Home Assistant states dump, by entity_id, in the
+    format of the mocked states of `GivenThatWrapper`.
+
+    :param path_or_states: Either:
+     - The path of a JSON file with the response of Home Assistant `/api/states`.
+       The file is streamed, and only parsed once per test session.
+     - The list of states from `/api/states`, already parsed.
+     - A dict of the same states, by entity_id.
+     - A `StatesSnapshot` already loaded, returned as is. Load in-memory states
+       once (eg. at module level) to share them between tests.
+
+    The states returned for a file are shared with every other test loading it,
+    they must be replaced, never modified in place.
+    """
+    if isinstance(path_or_states, StatesSnapshot):
+        return path_or_states
+    if isinstance(path_or_states, (str, os.PathLike)):
+        return _load_dump_file(path_or_states)
+    if isinstance(path_or_states, dict):
+        return StatesSnapshot(
+            _parse_state(state, entity_id)
+            for entity_id, state in path_or_states.items()
+        )
+    return StatesSnapshot(_parse_state(state) for state in path_or_states)
+
+
+def _load_dump_file(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _parsed_dump_files:
+        with open(path, encoding='utf-8') as dump_file:
+            _parsed_dump_files[key] = StatesSnapshot(
+                _parse_state(state) for state in _iter_json_array(dump_file)
+            )
+    return _parsed_dump_files[key]
+
+
+def _parse_state(state, entity_id=None):
+    """`(entity_id, mocked state)` of one state of the dump"""
+    if entity_id is None:
+        try:
+            entity_id = state['entity_id']
+        except (TypeError, KeyError):
+            raise StatesDumpError(f"State without 'entity_id' in states dump: {state!r}")
+    return entity_id, {
+        'main': state.get('state'),
+        'attributes': state.get('attributes') or {},
+        'last_updated': _parse_timestamp(state.get('last_updated')),
+        'last_changed': _parse_timestamp(state.get('last_changed')),
+    }
+
+
+def _parse_timestamp(timestamp):
+    if not timestamp:
+        return None
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    return datetime.fromisoformat(timestamp)
+
+
+def _iter_json_array(text_file, chunk_size=_CHUNK_SIZE):
+    """Yields the items of the JSON array in `text_file` one by one, reading it in chunks"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    end_of_file = False
+    in_array = False
+
+    while True:
+        separators = _WHITESPACE + ',' if in_array else _WHITESPACE
+        while position < len(buffer) and buffer[position] in separators:
+            position += 1
+
+        if position < len(buffer) and not in_array:
+            if buffer[position] != '[':
+                raise StatesDumpError("A states dump must be a JSON array of states")
+            in_array = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer):
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item goes on in the next chunk, unless this is the end of the file
+                if end_of_file:
+                    raise
+            else:
+                yield item
+                continue
+
+        if end_of_file:
+            raise StatesDumpError("Unexpected end of states dump")
+        chunk = text_file.read(chunk_size)
+        end_of_file = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
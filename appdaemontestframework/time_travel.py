@@ -1,3 +1,4 @@
+from appdaemontestframework.appdaemon_mock.scheduler import DEFAULT_MAX_CALLBACKS_UNTIL_IDLE
 from appdaemontestframework.hass_mocks import HassMocks
 import datetime
 
@@ -39,6 +40,35 @@ class TimeTravelWrapper:
         """
         return UnitsWrapper(expected_current_time, self._assert_current_time_seconds)
 
+    def fast_forward_to_next_event(self):
+        """
+        Jump straight to the next scheduled callback and run all the
+        callbacks due at that time.
+
+        Does nothing if no callback is scheduled.
+
+        Format:
+        > time_travel.fast_forward_to_next_event()
+        """
+        self._hass_mocks.AD.sched.sim_fast_forward_to_next_event()
+
+    def fast_forward_until_idle(self, max_callbacks=DEFAULT_MAX_CALLBACKS_UNTIL_IDLE):
+        """
+        Jump from one scheduled callback to the next until all the one-off
+        callbacks (`run_in`, `run_at`, ...) have been run.
+
+        Recurring callbacks (`run_every`, `run_daily`, ...) due before the
+        last one-off callback are run as well. The cost only depends on the
+        number of callbacks run, not on how far in time the simulation goes.
+
+        Raises a `RuntimeError` after running `max_callbacks` callbacks, in case
+        callbacks keep scheduling new ones. `None` removes the limit.
+
+        Format:
+        > time_travel.fast_forward_until_idle()
+        > time_travel.fast_forward_until_idle(max_callbacks=1_000_000)
+        """
+        self._hass_mocks.AD.sched.sim_fast_forward_until_idle(max_callbacks)
 
     def _fast_forward_seconds(self, seconds_to_fast_forward):
         self._hass_mocks.AD.sched.sim_fast_forward(datetime.timedelta(seconds=seconds_to_fast_forward))
@@ -0,0 +1,30 @@
+"""
+Per-test setup cost of `HassMocks`, with and without shared patches.
+
+Usage:
+> python benchmark/hass_mocks_setup.py
+"""
+import timeit
+
+from appdaemontestframework import HassMocks
+from appdaemontestframework.hass_mocks import stop_shared_patches
+
+NUMBER_OF_TESTS = 500
+
+
+def setup_and_teardown_one_test(share_patches):
+    hass_mocks = HassMocks(share_patches=share_patches)
+    hass_mocks.unpatch_mocks()
+
+
+def milliseconds_per_test(share_patches):
+    setup_and_teardown_one_test(share_patches)  # Warm-up, and initial patching when sharing
+    total_seconds = timeit.timeit(
+        lambda: setup_and_teardown_one_test(share_patches), number=NUMBER_OF_TESTS)
+    return total_seconds / NUMBER_OF_TESTS * 1000
+
+
+if __name__ == '__main__':
+    print(f"Patch once per test:    {milliseconds_per_test(False):.3f} ms/test")
+    print(f"Patch once per session: {milliseconds_per_test(True):.3f} ms/test")
+    stop_shared_patches()
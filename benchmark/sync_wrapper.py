@@ -0,0 +1,54 @@
+"""
+Cost of calling a coroutine wrapped by the `sync_wrapper` monkey patch,
+through the event loop and through the fast path.
+
+Usage:
+> python benchmark/sync_wrapper.py
+"""
+import asyncio
+import timeit
+
+from appdaemontestframework.appdaemon_mock import sync_wrapper
+from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon, close_shared_event_loop
+
+NUMBER_OF_CALLS = 20_000
+
+
+def sync_wrapper_through_the_event_loop(coro):
+    """The `sync_wrapper` as it was before the fast path"""
+    def inner_sync_wrapper(self, *args, **kwargs):
+        f = asyncio.ensure_future(coro(self, *args, **kwargs), loop=self.AD.loop)
+        self.AD.loop.run_until_complete(f)
+        return f.result()
+
+    return inner_sync_wrapper
+
+
+class Api:
+    def __init__(self):
+        self.AD = MockAppDaemon()
+
+    async def _get_state(self, entity_id):
+        return 'on'
+
+    async def _sleep(self, entity_id):
+        await asyncio.sleep(0)
+        return 'on'
+
+    get_state_through_the_event_loop = sync_wrapper_through_the_event_loop(_get_state)
+    get_state = sync_wrapper(_get_state)
+    sleep_and_get_state = sync_wrapper(_sleep)
+
+
+def microseconds_per_call(function):
+    function('light.kitchen')  # Warm-up
+    total_seconds = timeit.timeit(lambda: function('light.kitchen'), number=NUMBER_OF_CALLS)
+    return total_seconds / NUMBER_OF_CALLS * 1_000_000
+
+
+if __name__ == '__main__':
+    api = Api()
+    print(f"Through the event loop:     {microseconds_per_call(api.get_state_through_the_event_loop):.2f} µs/call")
+    print(f"Fast path:                  {microseconds_per_call(api.get_state):.2f} µs/call")
+    print(f"Fallback on the event loop: {microseconds_per_call(api.sleep_and_get_state):.2f} µs/call")
+    close_shared_event_loop()
@@ -0,0 +1,60 @@
+import asyncio
+
+from appdaemontestframework.appdaemon_mock import appdaemon
+from appdaemontestframework.appdaemon_mock.appdaemon import (
+    MockAppDaemon,
+    get_shared_event_loop,
+    close_shared_event_loop,
+)
+
+
+def test_every_mock_appdaemon_shares_the_same_event_loop():
+    assert MockAppDaemon().loop is MockAppDaemon().loop
+    assert MockAppDaemon().loop is get_shared_event_loop()
+
+
+def test_explicit_loop():
+    loop = asyncio.new_event_loop()
+    try:
+        assert MockAppDaemon(loop=loop).loop is loop
+    finally:
+        loop.close()
+
+
+def test_stop_cancels_the_tasks_left_on_the_loop():
+    mock_ad = MockAppDaemon()
+
+    async def never_ending():
+        await asyncio.sleep(3600)
+
+    task = mock_ad.loop.create_task(never_ending())
+    mock_ad.stop()
+
+    assert task.cancelled()
+    assert not mock_ad.loop.is_closed()
+
+
+def test_start_after_the_loop_was_closed():
+    loop = asyncio.new_event_loop()
+    mock_ad = MockAppDaemon(loop=loop)
+    mock_ad.stop()
+    loop.close()
+
+    mock_ad.start()
+    assert mock_ad.loop is get_shared_event_loop()
+
+
+def test_close_shared_event_loop(monkeypatch):
+    # Do not close the loop shared by the rest of the test session
+    monkeypatch.setattr(appdaemon, '_shared_event_loop', None)
+    loop = get_shared_event_loop()
+
+    close_shared_event_loop()
+
+    assert loop.is_closed()
+    assert get_shared_event_loop() is not loop
+    close_shared_event_loop()
+
+
+def test_hass_mocks_use_the_session_event_loop(hass_mocks, appdaemon_event_loop):
+    assert hass_mocks.AD.loop is appdaemon_event_loop
@@ -0,0 +1,73 @@
+import asyncio
+import datetime
+import time
+
+import mock
+import pytest
+
+from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon
+from appdaemontestframework.appdaemon_mock.event_loop import (
+    VirtualTimeEventLoop,
+    to_loop_time,
+    from_loop_time,
+)
+
+
+@pytest.fixture
+def mock_ad():
+    mock_ad = MockAppDaemon(loop=VirtualTimeEventLoop())
+    yield mock_ad
+    mock_ad.stop()
+    mock_ad.loop.close()
+
+
+def test_loop_time_is_the_time_of_the_scheduler(mock_ad):
+    assert mock_ad.loop.time() == to_loop_time(mock_ad.sched._now)
+
+    mock_ad.sched.sim_fast_forward(datetime.timedelta(minutes=5))
+
+    assert mock_ad.loop.time() == to_loop_time(datetime.datetime(2000, 1, 1, 0, 5))
+
+
+def test_from_loop_time_is_never_before_the_loop_time():
+    for loop_time in (946684800.001, 946684800.0000013, 946684860.0):
+        assert to_loop_time(from_loop_time(loop_time)) >= loop_time
+
+
+def test_waiting_jumps_straight_to_the_next_timer(mock_ad):
+    async def sleep_an_hour():
+        await asyncio.sleep(3600)
+        return 'done'
+
+    assert mock_ad.loop.run_until_complete(sleep_an_hour()) == 'done'
+    assert mock_ad.sched.get_now_naive_sync() == datetime.datetime(2000, 1, 1, 1, 0)
+
+
+def test_scheduler_callbacks_due_before_the_next_timer_are_run(mock_ad):
+    callback = mock.Mock()
+    mock_ad.sched.insert_schedule_sync(
+        'run_in', mock_ad.sched.convert_naive(datetime.datetime(2000, 1, 1, 0, 30)),
+        callback, False, 'run_in')
+
+    mock_ad.loop.run_until_complete(asyncio.sleep(3600))
+
+    callback.assert_called_once()
+
+
+def test_fast_forward_runs_the_timers_due(mock_ad):
+    fired = []
+    mock_ad.loop.call_later(10, fired.append, 'first')
+    mock_ad.loop.call_later(20, fired.append, 'second')
+
+    mock_ad.sched.sim_fast_forward(datetime.timedelta(seconds=15))
+    assert fired == ['first']
+    mock_ad.sched.sim_fast_forward(datetime.timedelta(seconds=5))
+    assert fired == ['first', 'second']
+
+
+def test_without_scheduler_the_loop_uses_the_real_time():
+    loop = VirtualTimeEventLoop()
+    try:
+        assert abs(loop.time() - time.monotonic()) < 1
+    finally:
+        loop.close()
@@ -42,12 +42,13 @@ class Test_time_movement:
         assert scheduler.get_now_sync() == pytz.utc.localize(new_time)
 
     @pytest.mark.asyncio
-    async def test_cant_set_start_time_with_pending_callbacks(self, scheduler):
+    async def test_setting_start_time_keeps_the_delay_of_pending_callbacks(self, scheduler):
         scheduled_time = scheduler.get_now_sync() + datetime.timedelta(seconds=10)
         await scheduler.insert_schedule('', scheduled_time, lambda: None, False, None)
-        with pytest.raises(RuntimeError) as cm:
-            scheduler.sim_set_start_time(datetime.datetime(2010, 6, 1, 0, 0))
-        assert str(cm.value) == 'You can not set start time while callbacks are scheduled'
+
+        scheduler.sim_set_start_time(datetime.datetime(2010, 6, 1, 0, 0))
+
+        assert scheduler.sim_next_event_time() == pytz.utc.localize(datetime.datetime(2010, 6, 1, 0, 0, 10))
 
     def test_fast_forward_to_past_raises_exception(self, scheduler):
         with pytest.raises(ValueError) as cm:
@@ -188,3 +189,160 @@ class Test_scheduling_and_dispatch:
         assert  callback_mock.call_count == 2
         scheduler.sim_fast_forward(datetime.timedelta(seconds=10))
         assert  callback_mock.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_callbacks_due_at_the_same_time_run_in_registration_order(self, scheduler: MockScheduler):
+        manager = mock.Mock()
+        now = await scheduler.get_now()
+        for name in ['first', 'second', 'third']:
+            await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), getattr(manager, name), False, None)
+
+        scheduler.sim_fast_forward(datetime.timedelta(seconds=10))
+
+        assert manager.mock_calls == [mock.call.first({}), mock.call.second({}), mock.call.third({})]
+
+    @pytest.mark.asyncio
+    async def test_callback_with_interval_keeps_its_registration_order(self, scheduler: MockScheduler):
+        manager = mock.Mock()
+        now = await scheduler.get_now()
+        await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), manager.repeating, False, None, interval=10)
+        await scheduler.insert_schedule('', now + datetime.timedelta(seconds=20), manager.once, False, None)
+
+        scheduler.sim_fast_forward(datetime.timedelta(seconds=20))
+
+        assert manager.mock_calls == [
+            mock.call.repeating({}),
+            mock.call.repeating({}),
+            mock.call.once({}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_callback_can_cancel_its_own_timer(self, scheduler: MockScheduler):
+        now = await scheduler.get_now()
+        calls = []
+
+        def callback(kwargs):
+            calls.append(scheduler.get_now_sync())
+            scheduler.cancel_timer_sync('', handle)
+
+        handle = await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), callback, False, None, interval=10)
+        scheduler.sim_fast_forward(datetime.timedelta(minutes=1))
+
+        assert calls == [now + datetime.timedelta(seconds=10)]
+
+    @pytest.mark.asyncio
+    async def test_cancel_timer_returns_whether_the_timer_was_pending(self, scheduler: MockScheduler):
+        now = await scheduler.get_now()
+        handle = await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), mock.Mock(), False, None)
+
+        assert await scheduler.cancel_timer('', handle) is True
+        assert await scheduler.cancel_timer('', handle) is False
+        assert await scheduler.cancel_timer('', 'unknown handle') is False
+
+    @pytest.mark.asyncio
+    async def test_can_set_start_time_once_all_callbacks_are_cancelled(self, scheduler: MockScheduler):
+        now = await scheduler.get_now()
+        handle = await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), mock.Mock(), False, None)
+        await scheduler.cancel_timer('', handle)
+
+        scheduler.sim_set_start_time(datetime.datetime(2010, 6, 1, 0, 0))
+
+    @pytest.mark.asyncio
+    async def test_rearming_a_timer_many_times_only_runs_the_last_one(self, scheduler: MockScheduler):
+        callback_mock = mock.Mock()
+        now = await scheduler.get_now()
+        handle = None
+        for _ in range(1000):
+            if handle:
+                await scheduler.cancel_timer('', handle)
+            handle = await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), callback_mock, False, None)
+
+        scheduler.sim_fast_forward(datetime.timedelta(seconds=10))
+
+        callback_mock.assert_called_once_with({})
+
+
+class Test_recurring_callbacks:
+    def test_next_period_is_the_first_one_strictly_after_now(self, scheduler: MockScheduler):
+        scheduler.sim_set_start_time(datetime.datetime(2020, 1, 1, 12, 0))
+        day = datetime.timedelta(days=1)
+
+        assert scheduler.get_next_period_sync(day, datetime.time(13, 0)) == pytz.utc.localize(datetime.datetime(2020, 1, 1, 13, 0))
+        assert scheduler.get_next_period_sync(day, datetime.time(12, 0)) == pytz.utc.localize(datetime.datetime(2020, 1, 2, 12, 0))
+        assert scheduler.get_next_period_sync(day, "08:30:00") == pytz.utc.localize(datetime.datetime(2020, 1, 2, 8, 30))
+        assert scheduler.get_next_period_sync(60, datetime.datetime(2019, 1, 1, 0, 0, 10)) == pytz.utc.localize(datetime.datetime(2020, 1, 1, 12, 0, 10))
+        assert scheduler.get_next_period_sync(60, "immediate") == pytz.utc.localize(datetime.datetime(2020, 1, 1, 12, 0))
+        assert scheduler.get_next_period_sync(60, "now+5") == pytz.utc.localize(datetime.datetime(2020, 1, 1, 12, 0, 5))
+        assert scheduler.get_next_period_sync(60, "now - 5") == pytz.utc.localize(datetime.datetime(2020, 1, 1, 12, 0, 55))
+
+    def test_interval_must_be_positive(self, scheduler: MockScheduler):
+        with pytest.raises(ValueError):
+            scheduler.get_next_period_sync(0)
+
+    @pytest.mark.asyncio
+    async def test_setting_start_time_moves_recurring_callbacks_after_it(self, scheduler: MockScheduler):
+        callback_mock = mock.Mock()
+        start = await scheduler.get_next_period(datetime.timedelta(days=1), datetime.time(8, 0))
+        await scheduler.insert_schedule('', start, callback_mock, True, None, interval=datetime.timedelta(days=1))
+
+        scheduler.sim_set_start_time(datetime.datetime(2010, 6, 1, 9, 0))
+        scheduler.sim_fast_forward(datetime.timedelta(hours=23))
+        callback_mock.assert_called_once()
+        assert scheduler.get_now_sync() == pytz.utc.localize(datetime.datetime(2010, 6, 2, 8, 0))
+
+
+class Test_event_driven_time_movement:
+    def test_next_event_time_is_none_when_nothing_is_scheduled(self, scheduler: MockScheduler):
+        assert scheduler.sim_next_event_time() is None
+        assert scheduler.sim_fast_forward_to_next_event() is None
+        assert scheduler.get_now_sync() == pytz.utc.localize(datetime.datetime(2000, 1, 1, 0, 0))
+
+    @pytest.mark.asyncio
+    async def test_fast_forward_to_next_event_skips_cancelled_callbacks(self, scheduler: MockScheduler):
+        first_mock = mock.Mock()
+        second_mock = mock.Mock()
+        now = await scheduler.get_now()
+        handle = await scheduler.insert_schedule('', now + datetime.timedelta(seconds=10), first_mock, False, None)
+        await scheduler.insert_schedule('', now + datetime.timedelta(days=10), second_mock, False, None)
+        await scheduler.cancel_timer('', handle)
+
+        assert scheduler.sim_next_event_time() == now + datetime.timedelta(days=10)
+        assert scheduler.sim_fast_forward_to_next_event() == now + datetime.timedelta(days=10)
+        first_mock.assert_not_called()
+        second_mock.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_fast_forward_until_idle_runs_recurring_callbacks_due_before_the_last_one_off(self, scheduler: MockScheduler):
+        recurring_mock = mock.Mock()
+        one_off_mock = mock.Mock()
+        now = await scheduler.get_now()
+        await scheduler.insert_schedule('', now + datetime.timedelta(hours=1), recurring_mock, True, None, interval=datetime.timedelta(hours=1))
+        await scheduler.insert_schedule('', now + datetime.timedelta(days=30), one_off_mock, False, None)
+
+        assert scheduler.sim_fast_forward_until_idle() == now + datetime.timedelta(days=30)
+        one_off_mock.assert_called_once()
+        assert recurring_mock.call_count == 30 * 24
+
+    @pytest.mark.asyncio
+    async def test_fast_forward_until_idle_gives_up_on_callbacks_rescheduling_themselves(self, scheduler: MockScheduler):
+        def callback(kwargs):
+            scheduler.insert_schedule_sync('', scheduler.get_now_sync() + datetime.timedelta(seconds=1), callback, False, None)
+
+        callback({})
+
+        with pytest.raises(RuntimeError):
+            scheduler.sim_fast_forward_until_idle(max_callbacks=100)
+
+
+class Test_handles:
+    def test_handles_are_unique_deterministic_strings(self):
+        def schedule_three_callbacks(scheduler):
+            in_ten_seconds = scheduler.get_now_sync() + datetime.timedelta(seconds=10)
+            return [scheduler.insert_schedule_sync('', in_ten_seconds, lambda kwargs: None, False, None)
+                    for _ in range(3)]
+
+        handles = schedule_three_callbacks(MockScheduler(MockAppDaemon()))
+
+        assert all(isinstance(handle, str) for handle in handles)
+        assert len(set(handles)) == 3
+        assert schedule_three_callbacks(MockScheduler(MockAppDaemon())) == handles
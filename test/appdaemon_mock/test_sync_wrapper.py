@@ -0,0 +1,101 @@
+import asyncio
+
+import mock
+import pytest
+
+from appdaemontestframework.appdaemon_mock import sync_wrapper, _resume
+from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon
+
+
+class MockApi:
+    def __init__(self):
+        self.AD = MockAppDaemon()
+
+    @sync_wrapper
+    async def never_suspends(self, value):
+        return value * 2
+
+    @sync_wrapper
+    async def sleeps(self, delay, value):
+        await asyncio.sleep(delay)
+        return value
+
+    @sync_wrapper
+    async def waits_on_a_future(self, value):
+        future = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().call_soon(future.set_result, value)
+        return await future
+
+    @sync_wrapper
+    async def raises(self, suspend_first):
+        if suspend_first:
+            await asyncio.sleep(0)
+        raise ValueError('Oops')
+
+
+@pytest.fixture
+def api():
+    return MockApi()
+
+
+class TestFastPath:
+    def test_returns_result(self, api):
+        assert api.never_suspends(21) == 42
+
+    def test_does_not_run_the_event_loop(self, api):
+        with mock.patch.object(api.AD.loop, 'run_until_complete') as run_until_complete:
+            assert api.never_suspends(21) == 42
+        run_until_complete.assert_not_called()
+
+    def test_running_loop_is_restored(self, api):
+        api.never_suspends(21)
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+
+    def test_raises(self, api):
+        with pytest.raises(ValueError, match='Oops'):
+            api.raises(suspend_first=False)
+
+
+class TestFallbackOnTheEventLoop:
+    def test_bare_yield(self, api):
+        assert api.sleeps(0, 'done') == 'done'
+
+    def test_sleep(self, api):
+        assert api.sleeps(0.001, 'done') == 'done'
+
+    def test_future(self, api):
+        assert api.waits_on_a_future('done') == 'done'
+
+    def test_raises(self, api):
+        with pytest.raises(ValueError, match='Oops'):
+            api.raises(suspend_first=True)
+
+    def test_cancellation_is_forwarded(self):
+        loop = asyncio.new_event_loop()
+        cancelled = []
+
+        async def waits_forever():
+            try:
+                await asyncio.sleep(0)
+                await loop.create_future()
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        coroutine = waits_forever()
+        task = loop.create_task(_resume(coroutine, coroutine.send(None)))
+        loop.run_until_complete(asyncio.sleep(0.001))
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            loop.run_until_complete(task)
+        assert cancelled == [True]
+        loop.close()
+
+
+class TestWithRunningLoop:
+    @pytest.mark.asyncio
+    async def test_returns_a_future(self, api):
+        assert await api.never_suspends(21) == 42
+        assert await api.sleeps(0, 'done') == 'done'
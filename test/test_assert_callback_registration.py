@@ -282,3 +282,46 @@ class TestRegisteredRunAt:
             assert_that(automation) \
                 .registered.run_at(datetime(2019,11,5,22,43,0,0), extra_param='ok') \
                 .with_callback(automation._some_other_function)
+
+
+class CountingAutomation(hass.Hass):
+    def initialize(self):
+        self.calls = []
+        self.listen_state(self._on_state, 'light.some_light')
+        self.listen_event(self._on_event, 'some_event')
+        self.run_daily(self._on_time, time(hour=3))
+
+    def _on_state(self, entity, attribute, old, new, kwargs):
+        self.calls.append('state')
+
+    def _on_event(self, event_name, data, kwargs):
+        self.calls.append('event')
+
+    def _on_time(self, kwargs):
+        self.calls.append('time')
+
+
+@automation_fixture(CountingAutomation)
+def counting_automation(given_that):
+    given_that.time_is(time(hour=2))
+
+
+def test_assertions_do_not_register_the_callbacks_again(
+        given_that, assert_that, time_travel, counting_automation):
+    for _ in range(2):
+        assert_that(counting_automation) \
+            .listens_to.state('light.some_light') \
+            .with_callback(counting_automation._on_state)
+        assert_that(counting_automation) \
+            .listens_to.event('some_event') \
+            .with_callback(counting_automation._on_event)
+        assert_that(counting_automation) \
+            .registered.run_daily(time(hour=3)) \
+            .with_callback(counting_automation._on_time)
+    counting_automation.calls = []
+
+    given_that.state_of('light.some_light').changes_to('on')
+    given_that.event_fired('some_event')
+    time_travel.fast_forward(60).minutes()
+
+    assert counting_automation.calls == ['state', 'event', 'time']
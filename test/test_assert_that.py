@@ -1,6 +1,7 @@
 from datetime import time, datetime
 
 import appdaemon.plugins.hass.hassapi as hass
+import mock
 import pytest
 from pytest import mark
 
@@ -141,3 +142,98 @@ class TestTurnedOff:
             assert_that(LIGHT).was_not.turned_off()
             automation.turn_off_light_with_transition(via_helper=True)
             assert_that(LIGHT).was.turned_off(transition=TRANSITION_DURATION)
+
+
+class TestCallIndex:
+    def test_many_calls_to_other_entities(self, assert_that, automation):
+        for i in range(500):
+            automation.call_service('light/turn_on', entity_id='light.other_%s' % i)
+            automation.turn_off('light.other_%s' % i)
+
+        assert_that(LIGHT).was_not.turned_on()
+        automation.turn_on_light()
+        assert_that(LIGHT).was.turned_on()
+        assert_that('light.other_42').was.turned_on()
+        assert_that('light.other_42').was.turned_off()
+        assert_that(LIGHT).was_not.turned_off()
+
+    def test_calls_recorded_after_a_check_are_found(self, assert_that, automation):
+        assert_that(LIGHT).was_not.turned_on()
+        automation.turn_on_light(via_helper=True)
+        assert_that(LIGHT).was.turned_on()
+        assert_that('light/turn_on').was_not.called_with(entity_id=SWITCH)
+        automation.turn_on_switch()
+        assert_that('switch/turn_on').was.called_with(entity_id=SWITCH)
+
+    def test_matchers_are_checked_against_every_call(self, assert_that, automation):
+        automation.call_service('light/turn_on', entity_id=LIGHT, brightness=10)
+        automation.fire_event('SOME_EVENT', my_keyword='hello')
+
+        assert_that('light/turn_on').was.called_with(entity_id=mock.ANY, brightness=10)
+        assert_that(mock.ANY).was.turned_on(brightness=10)
+        assert_that(mock.ANY).was_not.turned_off()
+        assert_that(mock.ANY).was.fired(my_keyword='hello')
+
+    def test_clearing_the_mocks_resets_the_index(self, given_that, assert_that, automation):
+        automation.turn_on_light()
+        automation.turn_off_light(via_helper=True)
+        assert_that(LIGHT).was.turned_on()
+        assert_that(LIGHT).was.turned_off()
+
+        given_that.mock_functions_are_cleared()
+
+        assert_that(LIGHT).was_not.turned_on()
+        assert_that(LIGHT).was_not.turned_off()
+
+    def test_only_the_service_part_of_the_service_must_match(self, assert_that, automation):
+        automation.call_service('homeassistant/turn_on', entity_id=LIGHT)
+        assert_that(LIGHT).was.turned_on()
+        automation.call_service('light/turn_on_something_else', entity_id=SWITCH)
+        assert_that(SWITCH).was_not.turned_on()
+
+    def test_service_called_with_a_list_of_entities(self, assert_that, automation):
+        automation.call_service('light/turn_on', entity_id=[LIGHT, SWITCH])
+        assert_that('light/turn_on').was.called_with(entity_id=[LIGHT, SWITCH])
+        assert_that('light/turn_on').was_not.called_with(entity_id=[LIGHT])
+
+
+class TestFailureMessages:
+    def test_only_summarises_the_recorded_calls(self, assert_that, automation):
+        for i in range(100):
+            automation.call_service('light/turn_on', entity_id='light.other_%s' % i)
+
+        with pytest.raises(AssertionError) as failure:
+            assert_that(LIGHT).was.turned_on()
+
+        message = str(failure.value)
+        assert "'turn_on' was never called" in message
+        assert "light.other_99" in message
+        assert "light.other_0'" not in message
+        assert "(90 earlier)" in message
+
+    def test_shows_calls_with_the_same_target(self, assert_that, automation):
+        automation.turn_on_light_with_transition(via_helper=True)
+        automation.turn_on_switch(via_helper=True)
+
+        with pytest.raises(AssertionError) as failure:
+            assert_that(LIGHT).was.turned_on(transition=TRANSITION_DURATION + 1)
+
+        message = str(failure.value)
+        assert "turn_on('light.some_light', transition=2)" in message
+        assert SWITCH not in message
+
+    def test_truncates_long_calls(self, assert_that, automation):
+        automation.call_service('notify/notify', message='x' * 10000)
+
+        with pytest.raises(AssertionError) as failure:
+            assert_that('notify/notify').was.called_with(message='y')
+
+        assert len(str(failure.value)) < 1000
+
+    def test_was_not(self, assert_that, automation):
+        automation.turn_on_light()
+
+        with pytest.raises(AssertionError, match='Should NOT have been turned ON'):
+            assert_that(LIGHT).was_not.turned_on()
+        with pytest.raises(AssertionError, match='shoud NOT have been called'):
+            assert_that('light/turn_on').was_not.called_with(entity_id=LIGHT)
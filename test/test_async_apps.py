@@ -0,0 +1,145 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+from appdaemon.plugins.hass.hassapi import Hass
+
+from appdaemontestframework import automation_fixture
+
+LIGHT = 'light.some_light'
+
+
+class AsyncAutomation(Hass):
+    async def initialize(self):
+        self.start = await self.datetime()
+        await self.run_in(self._turn_on_for_a_minute, 10)
+
+    async def _turn_on_for_a_minute(self, kwargs):
+        self.turn_on(LIGHT)
+        await self.sleep(60)
+        await self.turn_off(LIGHT)
+        self.turned_off_at = await self.datetime()
+
+    async def blink_every_second(self, times):
+        for _ in range(times):
+            await self.call_service('light/toggle', entity_id=LIGHT)
+            await self.sleep(1)
+
+    async def fail_after(self, seconds):
+        await self.sleep(seconds)
+        raise ValueError('Failed on purpose')
+
+    def sync_helper(self):
+        return self.get_state(LIGHT)
+
+
+@automation_fixture(AsyncAutomation)
+def automation(given_that):
+    given_that.time_is(datetime.datetime(2020, 1, 1, 12, 0))
+
+
+def test_async_initialize(hass_mocks, automation):
+    assert automation.start == datetime.datetime(2020, 1, 1, 12, 0)
+    assert hass_mocks.AD.sched.sim_next_event_time() == \
+        hass_mocks.AD.sched.convert_naive(datetime.datetime(2020, 1, 1, 12, 0, 10))
+
+
+def test_async_callback(assert_that, time_travel, automation):
+    time_travel.fast_forward(10).seconds()
+    assert_that(LIGHT).was.turned_on()
+    assert_that(LIGHT).was_not.turned_off()
+
+    time_travel.fast_forward(59).seconds()
+    assert_that(LIGHT).was_not.turned_off()
+
+    time_travel.fast_forward(1).seconds()
+    assert_that(LIGHT).was.turned_off()
+    assert automation.turned_off_at == datetime.datetime(2020, 1, 1, 12, 1, 10)
+
+
+def test_hours_of_sleeps_in_no_time(hass_mocks, time_travel, automation):
+    automation.run_in(lambda kwargs: automation.blink_every_second(3 * 3600), 1)
+
+    real_start = time.monotonic()
+    time_travel.fast_forward(3 * 60 + 1).minutes()
+
+    assert time.monotonic() - real_start < 30
+    assert hass_mocks.hass_functions['call_service'].call_count == 3 * 3600
+
+
+def test_fast_forward_to_next_event(time_travel, automation):
+    time_travel.fast_forward(10).seconds()
+
+    time_travel.fast_forward_to_next_event()
+    time_travel.assert_current_time(70).seconds()
+
+
+def test_fast_forward_until_idle(assert_that, time_travel, automation):
+    time_travel.fast_forward_until_idle()
+
+    assert_that(LIGHT).was.turned_off()
+    time_travel.assert_current_time(70).seconds()
+
+
+def test_asyncio_timers(time_travel, automation):
+    fired_at = []
+
+    async def call_later():
+        asyncio.get_running_loop().call_later(
+            30, lambda: fired_at.append(automation.datetime()))
+
+    automation.run_in(lambda kwargs: call_later(), 0)
+    time_travel.fast_forward(29).seconds()
+    assert fired_at == []
+    time_travel.fast_forward(1).seconds()
+    assert fired_at == [datetime.datetime(2020, 1, 1, 12, 0, 30)]
+
+
+def test_exceptions_raised_in_async_callbacks(time_travel, automation):
+    automation.run_in(lambda kwargs: automation.fail_after(5), 0)
+
+    time_travel.fast_forward(4).seconds()
+    with pytest.raises(ValueError, match='Failed on purpose'):
+        time_travel.fast_forward(1).seconds()
+
+
+def test_sync_code_gets_results_directly(given_that, automation):
+    given_that.state_of(LIGHT).is_set_to('on')
+    assert automation.sync_helper() == 'on'
+
+
+def test_sync_code_calls_async_api_methods_directly(automation):
+    assert automation.datetime() == datetime.datetime(2020, 1, 1, 12, 0)
+
+
+class AsyncAppWithSyncListeners(Hass):
+    def initialize(self):
+        self.seen = []
+        self.listen_event(self._on_event, 'some_event')
+        self.listen_state(self._on_light, LIGHT)
+
+    async def fire_and_turn_on(self):
+        await self.fire_event('some_event')
+        await self.turn_on(LIGHT)
+
+    def _on_event(self, event, data, kwargs):
+        self.seen.append(self.get_state(LIGHT))
+
+    def _on_light(self, entity, attribute, old, new, kwargs):
+        self.seen.append(self.get_state(LIGHT))
+
+
+@automation_fixture(AsyncAppWithSyncListeners)
+def app_with_sync_listeners(given_that):
+    given_that.state_of(LIGHT).is_set_to('off')
+
+
+@pytest.mark.parametrize('simulate_service_calls', [True])
+def test_sync_listeners_called_from_async_apps_get_results_directly(
+        time_travel, app_with_sync_listeners):
+    app_with_sync_listeners.run_in(lambda kwargs: app_with_sync_listeners.fire_and_turn_on(), 1)
+
+    time_travel.fast_forward(1).seconds()
+
+    assert app_with_sync_listeners.seen == ['off', 'on']
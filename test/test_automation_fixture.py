@@ -1,6 +1,8 @@
+import importlib
 import re
 from textwrap import dedent
 
+import mock
 import pytest
 from appdaemon.plugins.hass.hassapi import Hass
 from pytest import mark, fixture
@@ -349,3 +351,54 @@ class TestAutomationFixture:
 
             result = testdir.runpytest()
             result.assert_outcomes(passed=2)
+
+
+class SimpleAutomation(Hass):
+    def initialize(self):
+        pass
+
+
+def test_automation_shares_the_appdaemon_of_hass_mocks(given_that, hass_mocks):
+    from appdaemontestframework.automation_fixture import _instantiate_and_initialize_automation
+
+    with mock.patch(
+        "appdaemontestframework.appdaemon_mock.appdaemon.MockAppDaemon.__init__",
+        side_effect=AssertionError("No other MockAppDaemon should be created"),
+    ):
+        automation = _instantiate_and_initialize_automation(
+            lambda: None, SimpleAutomation, given_that, hass_mocks.hass_functions, hass_mocks
+        )
+
+    assert automation.AD is hass_mocks.AD
+
+
+class TestAppConfig:
+    def test_config_of_the_automation(self):
+        from appdaemontestframework.automation_fixture import app_config_for
+
+        config = app_config_for(SimpleAutomation)
+
+        assert config.name == "SimpleAutomation"
+        assert config.class_name == "SimpleAutomation"
+        assert config.module_name == SimpleAutomation.__module__
+
+    def test_every_automation_gets_its_own_copy(self):
+        from appdaemontestframework.automation_fixture import app_config_for
+
+        assert app_config_for(SimpleAutomation) is not app_config_for(SimpleAutomation)
+
+    def test_overrides(self):
+        from appdaemontestframework.automation_fixture import app_config_for
+
+        assert app_config_for(SimpleAutomation, name="other_name").name == "other_name"
+        assert app_config_for(SimpleAutomation).name == "SimpleAutomation"
+
+
+def test_automation_classes_are_only_validated_once():
+    # `appdaemontestframework.automation_fixture` is shadowed by the decorator of the same name
+    automation_fixture_module = importlib.import_module("appdaemontestframework.automation_fixture")
+
+    automation_fixture_module.ensure_automation_is_valid(SimpleAutomation)
+    with mock.patch.object(automation_fixture_module, "signature") as signature:
+        automation_fixture_module.ensure_automation_is_valid(SimpleAutomation)
+    signature.assert_not_called()
@@ -0,0 +1,141 @@
+import appdaemon.plugins.hass.hassapi as hass
+import mock
+import pytest
+
+from appdaemontestframework import automation_fixture
+from appdaemontestframework.call_recorder import CallRecorder
+
+LIGHT = 'light.some_light'
+
+
+@pytest.fixture
+def recorder():
+    return CallRecorder('some_function')
+
+
+class TestCallRecorder:
+    def test_records_calls(self, recorder):
+        recorder('first', key='value')
+        recorder('second')
+
+        assert recorder.call_count == 2
+        assert recorder.called
+        assert recorder.call_args == mock.call('second')
+        assert recorder.call_args_list == [mock.call('first', key='value'), mock.call('second')]
+
+    @pytest.mark.parametrize('recorded', [CallRecorder('some_function'), mock.MagicMock()])
+    def test_call_args_unpack_like_magic_mock(self, recorded):
+        recorded('first', key='value')
+
+        args, kwargs = recorded.call_args
+        assert (args, kwargs) == (('first',), {'key': 'value'})
+        assert recorded.call_args[0] == ('first',)
+        assert recorded.call_args.args == ('first',)
+        assert recorded.call_args_list[0][1] == {'key': 'value'}
+        assert recorded.mock_calls == [mock.call('first', key='value')]
+
+    def test_assert_any_call(self, recorder):
+        recorder('first', key='value')
+        recorder('second')
+
+        recorder.assert_any_call('first', key='value')
+        recorder.assert_any_call(mock.ANY, key='value')
+        with pytest.raises(AssertionError, match=r"some_function\('first'\) call not found"):
+            recorder.assert_any_call('first')
+
+    def test_assert_called_with_only_checks_the_last_call(self, recorder):
+        recorder('first')
+        recorder('second')
+
+        recorder.assert_called_with('second')
+        with pytest.raises(AssertionError):
+            recorder.assert_called_with('first')
+        with pytest.raises(AssertionError):
+            recorder.assert_called_once_with('second')
+
+    def test_assert_called_and_not_called(self, recorder):
+        recorder.assert_not_called()
+        with pytest.raises(AssertionError):
+            recorder.assert_called()
+
+        recorder()
+
+        recorder.assert_called()
+        recorder.assert_called_once()
+        with pytest.raises(AssertionError):
+            recorder.assert_not_called()
+
+    def test_assert_has_calls(self, recorder):
+        recorder(1)
+        recorder(2)
+        recorder(3)
+
+        recorder.assert_has_calls([mock.call(2), mock.call(3)])
+        recorder.assert_has_calls([mock.call(3), mock.call(1)], any_order=True)
+        with pytest.raises(AssertionError):
+            recorder.assert_has_calls([mock.call(3), mock.call(1)])
+
+    def test_return_value_and_side_effect(self, recorder):
+        assert recorder() is None
+        recorder.return_value = 'returned'
+        assert recorder() == 'returned'
+
+        recorder.side_effect = lambda value: value * 2
+        assert recorder(21) == 42
+
+        recorder.side_effect = ['first', 'second']
+        assert recorder() == 'first'
+        assert recorder() == 'second'
+
+        recorder.side_effect = ValueError
+        with pytest.raises(ValueError):
+            recorder()
+
+    def test_reset_mock(self, recorder):
+        recorder.return_value = 'returned'
+        recorder.side_effect = ValueError
+        with pytest.raises(ValueError):
+            recorder()
+
+        recorder.reset_mock()
+        assert recorder.call_count == 0
+        assert recorder.side_effect is ValueError
+
+        recorder.reset_mock(return_value=True, side_effect=True)
+        assert recorder() is None
+
+
+class MockAutomation(hass.Hass):
+    def initialize(self):
+        self.listen_state(self._on_light_change, LIGHT)
+
+    def _on_light_change(self, entity, attribute, old, new, kwargs):
+        pass
+
+    def turn_on_light_many_times(self, times):
+        for _ in range(times):
+            self.call_service('light/turn_on', entity_id=LIGHT)
+
+
+@automation_fixture(MockAutomation)
+def automation():
+    pass
+
+
+class TestHassMocksWithCallRecorders:
+    @pytest.fixture
+    def use_call_recorders(self):
+        return True
+
+    def test_hot_functions_use_call_recorders(self, hass_mocks, automation):
+        assert isinstance(hass_mocks.hass_functions['call_service'], CallRecorder)
+
+    def test_helpers_work_with_call_recorders(self, given_that, assert_that, automation):
+        given_that.state_of(LIGHT).is_set_to('off')
+        automation.turn_on_light_many_times(1000)
+
+        assert automation.get_state(LIGHT) == 'off'
+        assert_that(LIGHT).was.turned_on()
+        assert_that(automation) \
+            .listens_to.state(LIGHT) \
+            .with_callback(automation._on_light_change)
@@ -1,3 +1,4 @@
+import pytest
 from appdaemon.plugins.hass.hassapi import Hass
 
 from appdaemontestframework import automation_fixture
@@ -8,11 +9,14 @@ COVER = 'cover.some_cover'
 
 class MockAutomation(Hass):
     def initialize(self):
-        pass
+        self.received = []
 
     def send_event(self):
         self.fire_event("SOME_EVENT", my_keyword="hello")
 
+    def record(self, event_name, data, kwargs):
+        self.received.append((event_name, data))
+
 
 @automation_fixture(MockAutomation)
 def automation():
@@ -21,7 +25,101 @@ def automation():
 
 def test_it_does_not_crash_when_testing_automation_that_sends_events(given_that,
                                                                      automation: MockAutomation):
-    # For now, there is not assertion feature on events, so we're just ensuring
-    # appdaemontestframework is not crashing when testing an automation that
-    # sends events.
     automation.send_event()
+
+
+class TestAssertions:
+    def test_was_fired(self, assert_that, automation):
+        automation.send_event()
+
+        assert_that('SOME_EVENT').was.fired(my_keyword="hello")
+        assert_that('SOME_EVENT').was_not.fired(my_keyword="bye")
+        assert_that('OTHER_EVENT').was_not.fired(my_keyword="hello")
+
+    def test_failure_message_lists_the_events_fired(self, assert_that, automation):
+        automation.send_event()
+
+        with pytest.raises(AssertionError) as error:
+            assert_that('SOME_EVENT').was.fired(my_keyword="bye")
+        assert "fire_event('SOME_EVENT', my_keyword='hello')" in str(error.value)
+
+
+class TestEventBus:
+    def test_events_fired_by_apps_are_dispatched(self, automation):
+        automation.listen_event(automation.record, 'SOME_EVENT')
+
+        automation.send_event()
+
+        assert automation.received == [('SOME_EVENT', {'my_keyword': 'hello'})]
+
+    def test_events_fired_by_tests_are_dispatched(self, given_that, assert_that, automation):
+        automation.listen_event(automation.record, 'click')
+
+        given_that.event_fired('click', entity_id='button.kitchen')
+
+        assert automation.received == [('click', {'entity_id': 'button.kitchen'})]
+        assert_that('click').was_not.fired(entity_id='button.kitchen')
+
+    def test_only_listeners_of_the_event_are_called(self, given_that, automation):
+        automation.listen_event(automation.record, 'click')
+
+        given_that.event_fired('motion')
+
+        assert automation.received == []
+
+    def test_listener_of_every_event(self, given_that, automation):
+        automation.listen_event(automation.record)
+
+        given_that.event_fired('click')
+        given_that.event_fired('motion')
+
+        assert [event for event, _ in automation.received] == ['click', 'motion']
+
+    @pytest.mark.parametrize('filters, called', [
+        ({'entity_id': 'button.kitchen'}, True),
+        ({'entity_id': 'button.bathroom'}, False),
+        ({'entity_id': 'button.kitchen', 'click_type': 'single'}, True),
+        ({'entity_id': 'button.kitchen', 'click_type': 'double'}, False),
+        ({'click_type': lambda click_type: click_type.endswith('le')}, True),
+        # Like in AppDaemon, filters on data missing from the event are ignored
+        ({'unknown': 'value'}, True),
+        ({'entity_id': 'button.kitchen', 'oneshot': False}, True),
+    ])
+    def test_filters(self, given_that, automation, filters, called):
+        automation.listen_event(automation.record, 'click', **filters)
+
+        given_that.event_fired('click', entity_id='button.kitchen', click_type='single')
+
+        assert bool(automation.received) == called
+
+    def test_callback_receives_the_kwargs(self, given_that, automation):
+        received = []
+        automation.listen_event(
+            lambda *args: received.append(args[2]), 'click', entity_id='button.kitchen')
+
+        given_that.event_fired('click', entity_id='button.kitchen')
+
+        assert received == [{'entity_id': 'button.kitchen'}]
+
+    def test_cancelled_listener_is_not_called(self, given_that, automation):
+        handle = automation.listen_event(automation.record, 'click', entity_id='button.kitchen')
+
+        automation.cancel_listen_event(handle)
+        given_that.event_fired('click', entity_id='button.kitchen')
+
+        assert automation.received == []
+
+    def test_oneshot(self, given_that, automation):
+        automation.listen_event(automation.record, 'click', oneshot=True)
+
+        given_that.event_fired('click')
+        given_that.event_fired('click')
+
+        assert len(automation.received) == 1
+
+    def test_return_value_configured_by_the_test(self, hass_mocks, automation):
+        automation.listen_event(automation.record, 'SOME_EVENT')
+        hass_mocks.hass_functions['fire_event'].return_value = {'fired': True}
+
+        assert automation.fire_event('SOME_EVENT') == {'fired': True}
+        assert automation.received == [('SOME_EVENT', {})]
@@ -0,0 +1,243 @@
+import json
+
+import pytest
+
+from appdaemontestframework.mocked_states import HistoryEntry, MockedStates, StateHistory
+from appdaemontestframework.states_dump import load_states_dump
+
+
+def state(main, **attributes):
+    return {'main': main, 'attributes': attributes, 'last_updated': None, 'last_changed': None}
+
+
+@pytest.fixture
+def base():
+    return {'light.kitchen': state('on', brightness=10), 'light.bedroom': state('off')}
+
+
+@pytest.fixture
+def states(base):
+    states = MockedStates()
+    states.add_base(base)
+    return states
+
+
+class TestLayers:
+    def test_reads_through_to_the_base(self, states):
+        assert states['light.kitchen']['main'] == 'on'
+        assert 'light.bedroom' in states
+        assert 'light.other' not in states
+        assert len(states) == 2
+
+    def test_setting_a_state_leaves_the_base_untouched(self, states, base):
+        states['light.kitchen'] = state('off')
+
+        assert states['light.kitchen']['main'] == 'off'
+        assert base['light.kitchen']['main'] == 'on'
+        assert len(states) == 2
+
+    def test_deleting_a_state_of_the_base(self, states, base):
+        del states['light.kitchen']
+
+        assert 'light.kitchen' not in states
+        assert list(states) == ['light.bedroom']
+        assert 'light.kitchen' in base
+        with pytest.raises(KeyError):
+            states['light.kitchen']
+
+        states['light.kitchen'] = state('off')
+        assert states['light.kitchen']['main'] == 'off'
+
+    def test_iterates_each_entity_once(self, states):
+        states['light.kitchen'] = state('off')
+        states['switch.fan'] = state('on')
+
+        assert sorted(states) == ['light.bedroom', 'light.kitchen', 'switch.fan']
+
+    def test_new_base_replaces_the_states_already_set(self, states):
+        states['light.kitchen'] = state('off')
+        del states['light.bedroom']
+
+        states.add_base({'light.kitchen': state('unavailable'), 'light.bedroom': state('on')})
+
+        assert states['light.kitchen']['main'] == 'unavailable'
+        assert states['light.bedroom']['main'] == 'on'
+
+    def test_equal_to_a_dict(self, states, base):
+        assert states == base
+
+
+class TestViews:
+    def test_full_state_view(self, states):
+        assert states.full_state_view() == {
+            'light.kitchen': {'state': 'on', 'attributes': {'brightness': 10}},
+            'light.bedroom': {'state': 'off', 'attributes': {}},
+        }
+
+    def test_views_are_cached_until_the_states_change(self, states):
+        full_view = states.full_state_view()
+        domain_view = states.domain_view('light')
+
+        assert states.full_state_view() is full_view
+        assert states.domain_view('light') is domain_view
+
+    def test_views_are_updated_on_write(self, states):
+        states.full_state_view()
+        states.domain_view('light')
+
+        states['light.kitchen'] = state('off')
+        states['switch.fan'] = state('on')
+        del states['light.bedroom']
+
+        assert states.full_state_view() == {
+            'light.kitchen': {'state': 'off', 'attributes': {}},
+            'switch.fan': {'state': 'on', 'attributes': {}},
+        }
+        assert states.domain_view('light') == {'light.kitchen': {'state': 'off', 'attributes': {}}}
+
+    def test_views_returned_before_a_write_are_not_changed(self, states):
+        full_view = states.full_state_view()
+        domain_view = states.domain_view('light')
+
+        states['light.kitchen'] = state('off')
+
+        assert full_view['light.kitchen']['state'] == 'on'
+        assert domain_view['light.kitchen']['state'] == 'on'
+        assert states.full_state_view() is not full_view
+
+    def test_views_are_plain_dicts(self, states, base):
+        view = states.full_state_view()
+        assert type(view) is dict
+        assert json.loads(json.dumps(view)) == view
+
+        view['light.kitchen']['attributes']['brightness'] = 0
+        assert base['light.kitchen']['attributes'] == {'brightness': 10}
+
+    def test_domain_view(self, states):
+        states['switch.fan'] = state('on')
+        states['light.hallway'] = state('on')
+
+        assert set(states.domain_view('light')) == {
+            'light.kitchen', 'light.bedroom', 'light.hallway'}
+        assert states.domain_view('switch') == {'switch.fan': {'state': 'on', 'attributes': {}}}
+        assert states.domain_view('cover') == {}
+
+    def test_new_base_resets_the_views(self, states):
+        states.full_state_view()
+        states.domain_view('light')
+
+        states.add_base(load_states_dump([{'entity_id': 'light.kitchen', 'state': 'off'}]))
+
+        assert states.full_state_view()['light.kitchen']['state'] == 'off'
+        assert states.domain_view('light')['light.kitchen']['state'] == 'off'
+
+
+class TestDomainIndex:
+    def test_entities_of_domain_across_layers(self, states):
+        states['light.hallway'] = state('on')
+        states['switch.fan'] = state('on')
+
+        assert states.entities_of_domain('light') == [
+            'light.hallway', 'light.kitchen', 'light.bedroom']
+        assert states.entities_of_domain('switch') == ['switch.fan']
+        assert states.entities_of_domain('cover') == []
+
+    def test_deleted_entities_leave_the_index(self, states):
+        states['switch.fan'] = state('on')
+
+        del states['switch.fan']
+        del states['light.kitchen']
+
+        assert states.entities_of_domain('switch') == []
+        assert states.entities_of_domain('light') == ['light.bedroom']
+
+    def test_entities_replaced_by_a_new_base_are_listed_once(self, states):
+        states['light.kitchen'] = state('off')
+        states.add_base(load_states_dump([{'entity_id': 'light.kitchen', 'state': 'on'}]))
+
+        assert sorted(states.entities_of_domain('light')) == ['light.bedroom', 'light.kitchen']
+
+
+class TestStateHistory:
+    def test_entries_rebuild_the_attributes(self):
+        history = StateHistory(capacity=10)
+        history.record(1, 'on', {'brightness': 10, 'color': 'red'})
+        history.record(2, 'on', {'brightness': 20, 'color': 'red'})
+        history.record(3, 'off', {'color': 'red'})
+
+        assert history.entries() == [
+            HistoryEntry(1, 'on', {'brightness': 10, 'color': 'red'}),
+            HistoryEntry(2, 'on', {'brightness': 20, 'color': 'red'}),
+            HistoryEntry(3, 'off', {'color': 'red'}),
+        ]
+
+    def test_unchanged_states_are_not_recorded(self):
+        history = StateHistory(capacity=10)
+        history.record(1, 'on', {'brightness': 10})
+        history.record(2, 'on', {'brightness': 10})
+
+        assert len(history) == 1
+
+    def test_only_the_last_states_are_kept(self):
+        history = StateHistory(capacity=2)
+        history.record(1, 'on', {'brightness': 10, 'color': 'red'})
+        history.record(2, 'on', {'brightness': 20, 'color': 'red'})
+        history.record(3, 'off', {'color': 'blue'})
+
+        assert history.entries() == [
+            HistoryEntry(2, 'on', {'brightness': 20, 'color': 'red'}),
+            HistoryEntry(3, 'off', {'color': 'blue'}),
+        ]
+
+
+class TestRecordedHistory:
+    @pytest.fixture
+    def clock(self):
+        class Clock:
+            now = 0
+
+            def __call__(self):
+                return self.now
+
+        return Clock()
+
+    def test_not_recorded_by_default(self, states):
+        states['light.kitchen'] = state('off')
+
+        assert states.history_of('light.kitchen') == []
+
+    def test_writes_are_recorded(self, states, clock):
+        states.record_history(clock)
+        clock.now = 10
+        states['light.kitchen'] = state('off')
+        clock.now = 20
+        del states['light.kitchen']
+
+        assert states.history_of('light.kitchen') == [
+            HistoryEntry(0, 'on', {'brightness': 10}),
+            HistoryEntry(10, 'off', {}),
+            HistoryEntry(20, None, {}),
+        ]
+
+    def test_unchanged_entities(self, states, clock):
+        states.record_history(clock)
+
+        assert states.history_of('light.bedroom') == [HistoryEntry(0, 'off', {})]
+        assert states.history_of('light.other') == []
+        assert states.entities_with_history() == ['light.bedroom']
+
+HOUSE = load_states_dump([
+    {'entity_id': 'light.light_%s' % i, 'state': 'on'} for i in range(2000)
+])
+
+
+class TestSharedBaseline:
+    @pytest.mark.parametrize('test_run', range(3))
+    def test_baseline_is_shared_not_copied(self, given_that, test_run):
+        given_that.states_are_loaded_from(HOUSE)
+        given_that.state_of('light.light_0').is_set_to('off')
+
+        assert given_that.mocked_states['light.light_0']['main'] == 'off'
+        assert given_that.mocked_states['light.light_1']['main'] == 'on'
+        assert HOUSE['light.light_0']['main'] == 'on'
+        assert given_that.mocked_states._bases == [HOUSE]
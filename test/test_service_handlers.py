@@ -0,0 +1,109 @@
+import pytest
+from appdaemon.plugins.hass.hassapi import Hass
+
+from appdaemontestframework import automation_fixture
+
+LIGHT = 'light.some_light'
+SWITCH = 'switch.some_switch'
+SPEAKER = 'media_player.speaker'
+COVER = 'cover.some_cover'
+
+
+class MockAutomation(Hass):
+    def initialize(self):
+        self.listen_state(self._switch_on_light, SWITCH, new='on')
+
+    def _switch_on_light(self, entity, attribute, old, new, kwargs):
+        self.turn_on(LIGHT, brightness=200)
+
+
+@automation_fixture(MockAutomation)
+def automation(given_that):
+    given_that.state_of(LIGHT).is_set_to('off')
+    given_that.state_of(SWITCH).is_set_to('off')
+
+
+class TestBuiltInHandlers:
+    @pytest.fixture
+    def simulate_service_calls(self):
+        return True
+
+    def test_turn_on_and_off(self, automation):
+        automation.turn_on(SWITCH)
+        assert automation.get_state(SWITCH) == 'on'
+
+        automation.call_service('switch/turn_off', entity_id=SWITCH)
+        assert automation.get_state(SWITCH) == 'off'
+
+    def test_toggle(self, automation):
+        automation.call_service('homeassistant/toggle', entity_id=[LIGHT, SWITCH])
+
+        assert automation.get_state(LIGHT) == 'on'
+        assert automation.get_state(SWITCH) == 'on'
+
+    def test_light_attributes(self, automation):
+        automation.call_service('light/turn_on', entity_id=LIGHT, brightness=50, transition=2)
+
+        assert automation.get_state(LIGHT, attribute='all')['attributes'] == {'brightness': 50}
+
+    def test_media_player_volume(self, given_that, automation):
+        given_that.state_of(SPEAKER).is_set_to('playing', {'volume_level': 0.2})
+
+        automation.call_service('media_player/volume_set', entity_id=SPEAKER, volume_level=0.6)
+
+        assert automation.get_state(SPEAKER, attribute='volume_level') == 0.6
+        assert automation.get_state(SPEAKER) == 'playing'
+
+    def test_closed_loop_through_state_listeners(self, given_that, assert_that, automation):
+        given_that.state_of(SWITCH).changes_to('on')
+
+        assert automation.get_state(LIGHT) == 'on'
+        assert automation.get_state(LIGHT, attribute='brightness') == 200
+        assert_that(LIGHT).was.turned_on(brightness=200)
+
+    def test_services_without_handler_leave_the_states_untouched(self, given_that, automation):
+        given_that.state_of(COVER).is_set_to('closed')
+
+        automation.call_service('cover/open_cover', entity_id=COVER)
+
+        assert automation.get_state(COVER) == 'closed'
+
+
+class TestWithoutSimulation:
+    def test_services_do_not_change_the_states(self, automation):
+        automation.turn_on(LIGHT)
+
+        assert automation.get_state(LIGHT) == 'off'
+
+    def test_return_value_configured_by_the_test(self, hass_mocks, automation):
+        hass_mocks.hass_functions['call_service'].return_value = {'result': 'ok'}
+        hass_mocks.hass_functions['turn_on'].return_value = 'turned on'
+
+        assert automation.call_service('light/turn_on', entity_id=LIGHT) == {'result': 'ok'}
+        assert automation.turn_on(LIGHT) == 'turned on'
+
+
+def test_custom_handler(given_that, automation):
+    def open_cover(state, data):
+        state['main'] = 'open'
+        state['attributes']['current_position'] = data.get('position', 100)
+
+    given_that.state_of(COVER).is_set_to('closed')
+    given_that.service('cover/open_cover').is_handled_by(open_cover)
+
+    automation.call_service('cover/open_cover', entity_id=COVER, position=30)
+
+    assert automation.get_state(COVER) == 'open'
+    assert automation.get_state(COVER, attribute='current_position') == 30
+
+
+def test_states_given_by_the_test_are_not_modified(given_that, automation):
+    attributes = {'brightness': 10}
+    given_that.state_of(LIGHT).is_set_to('off', attributes)
+    given_that.service('light/turn_on').is_handled_by(
+        lambda state, data: state['attributes'].update(data))
+
+    automation.turn_on(LIGHT, brightness=100)
+
+    assert automation.get_state(LIGHT, attribute='brightness') == 100
+    assert attributes == {'brightness': 10}
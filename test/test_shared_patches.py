@@ -0,0 +1,91 @@
+import mock
+import pytest
+from appdaemon.plugins.hass.hassapi import Hass
+from appdaemon.models.config.app import AppConfig
+
+from appdaemontestframework import HassMocks
+from appdaemontestframework.call_recorder import CallRecorder
+from appdaemontestframework.hass_mocks import stop_shared_patches
+
+
+class MockAutomation(Hass):
+    def initialize(self):
+        pass
+
+
+def create_automation():
+    return MockAutomation(
+        None, AppConfig(name='MockAutomation', module=__name__, **{'class': 'MockAutomation'}))
+
+
+@pytest.fixture
+def shared_hass_mocks():
+    created = []
+
+    def create(use_call_recorders=False):
+        created.append(HassMocks(share_patches=True, use_call_recorders=use_call_recorders))
+        return created[-1]
+
+    yield create
+    for hass_mocks in created:
+        hass_mocks.unpatch_mocks()
+    stop_shared_patches()
+
+
+def test_patches_are_reused(shared_hass_mocks):
+    first = shared_hass_mocks()
+    second = shared_hass_mocks()
+
+    for name, mocked_function in first.hass_functions.items():
+        assert second.hass_functions[name] is mocked_function
+
+
+def test_changing_use_call_recorders_replaces_the_patches(shared_hass_mocks):
+    first = shared_hass_mocks(use_call_recorders=False)
+    assert not isinstance(first.hass_functions['turn_on'], CallRecorder)
+
+    second = shared_hass_mocks(use_call_recorders=True)
+    automation = create_automation()
+    automation.turn_on('light.kitchen')
+
+    assert isinstance(second.hass_functions['turn_on'], CallRecorder)
+    second.hass_functions['turn_on'].assert_called_once_with('light.kitchen')
+
+
+def test_recorded_calls_and_configured_behavior_are_reset(shared_hass_mocks):
+    first = shared_hass_mocks()
+    automation = create_automation()
+    first.hass_functions['now_is_between'].return_value = True
+    first.hass_functions['call_service'].side_effect = RuntimeError
+    first.hass_functions['args']['some_arg'] = 'some_value'
+    automation.turn_on('light.kitchen')
+
+    second = shared_hass_mocks()
+    automation = create_automation()
+
+    second.hass_functions['turn_on'].assert_not_called()
+    assert automation.now_is_between('sunset', 'sunrise') is None
+    automation.call_service('light/turn_on')
+    assert second.hass_functions['args'] == {}
+
+
+def test_each_hass_mocks_keeps_its_own_scheduler(shared_hass_mocks):
+    first = shared_hass_mocks()
+    create_automation().run_daily(mock.Mock(), None)
+
+    second = shared_hass_mocks()
+    automation = create_automation()
+    automation.run_in(mock.Mock(), 10)
+
+    assert automation.AD is second.AD
+    assert first.AD.sched.sim_next_event_time() != second.AD.sched.sim_next_event_time()
+
+
+def test_stopping_shared_patches_restores_hass(shared_hass_mocks):
+    original_turn_on = Hass.turn_on
+    shared_hass_mocks().unpatch_mocks()
+    assert Hass.turn_on is not original_turn_on
+
+    stop_shared_patches()
+
+    assert Hass.turn_on is original_turn_on
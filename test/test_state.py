@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, timezone, timedelta
 
 import pytest
@@ -68,7 +69,9 @@ def test_set_and_get_all_attribute(given_that, automation: MockAutomation):
     given_that.state_of(LIGHT).is_set_to('on', attributes={'brightness': 11,
                                                            'color': 'blue'})
     assert automation.get_all_attributes_from_light() == {
-        'state': 'on', 'last_updated': None, 'last_changed': None,
+        'state': 'on',
+        'last_updated': '2000-01-01T00:00:00+00:00',
+        'last_changed': '2000-01-01T00:00:00+00:00',
         'entity_id': LIGHT,
         'attributes': {'brightness': 11, 'color': 'blue'}
     }
@@ -128,6 +131,52 @@ def test_get_complete_state_dictionary(given_that, automation: MockAutomation):
                 'state': 'on'}}
 
 
+def test_get_state_of_a_domain(given_that, automation: MockAutomation):
+    given_that.state_of(LIGHT).is_set_to('on', attributes={'brightness': 11})
+    given_that.state_of(COVER).is_set_to('closed')
+
+    get_state = automation.get_state
+    assert get_state('light') == {LIGHT: {'attributes': {'brightness': 11}, 'state': 'on'}}
+    assert get_state('switch') == {}
+    with pytest.raises(ValueError):
+        get_state('light', attribute='brightness')
+
+
+def test_set_states_of_a_domain(given_that, automation: MockAutomation):
+    given_that.state_of(LIGHT).is_set_to('on', attributes={'brightness': 11})
+    given_that.state_of('light.other').is_set_to('on')
+    given_that.state_of(COVER).is_set_to('closed')
+
+    given_that.states_of_domain('light').are_set_to('off', {'color': 'blue'})
+
+    assert automation.get_state('light') == {
+        LIGHT: {'attributes': {'color': 'blue'}, 'state': 'off'},
+        'light.other': {'attributes': {'color': 'blue'}, 'state': 'off'}}
+    assert automation.get_state(COVER) == 'closed'
+
+
+def test_all_the_states_are_a_snapshot(given_that, automation: MockAutomation):
+    given_that.state_of(LIGHT).is_set_to('on')
+    before = automation.get_state()
+
+    given_that.state_of(LIGHT).is_set_to('off')
+
+    assert isinstance(before, dict)
+    assert json.loads(json.dumps(before)) == before
+    assert before[LIGHT]['state'] == 'on'
+    assert automation.get_state()[LIGHT]['state'] == 'off'
+
+
+def test_apps_get_copies_of_the_attributes(given_that, automation: MockAutomation):
+    given_that.state_of(LIGHT).is_set_to('on', {'brightness': 11, 'rgb_color': [255, 0, 0]})
+
+    automation.get_state(LIGHT, attribute='all')['attributes']['brightness'] = 0
+    automation.get_state(LIGHT, attribute='rgb_color').append(255)
+
+    assert automation.get_state(LIGHT, attribute='all')['attributes'] == {
+        'brightness': 11, 'rgb_color': [255, 0, 0]}
+
+
 @pytest.mark.only
 def test_throw_typeerror_when_attributes_arg_not_passed_via_keyword(given_that,
                                                                     automation: MockAutomation):
@@ -135,3 +184,33 @@ def test_throw_typeerror_when_attributes_arg_not_passed_via_keyword(given_that,
                                                            'color': 'blue'})
     with pytest.raises(TypeError):
         automation.get_without_using_keyword()
+
+
+class TestAutomaticTimes:
+    def test_times_are_stamped_at_the_simulated_time(self, given_that, time_travel, automation):
+        given_that.time_is(datetime(2020, 1, 1, 12, 0))
+        given_that.state_of(LIGHT).is_set_to('on')
+
+        time_travel.fast_forward(5).minutes()
+        given_that.state_of(LIGHT).is_set_to('off')
+
+        assert automation.get_state(LIGHT, attribute='last_updated') == '2020-01-01T12:05:00+00:00'
+        assert automation.get_state(LIGHT, attribute='last_changed') == '2020-01-01T12:05:00+00:00'
+
+    def test_last_changed_only_when_the_state_changes(self, given_that, time_travel, automation):
+        given_that.time_is(datetime(2020, 1, 1, 12, 0))
+        given_that.state_of(LIGHT).is_set_to('on')
+
+        time_travel.fast_forward(5).minutes()
+        given_that.state_of(LIGHT).is_set_to('on', {'brightness': 11})
+
+        all_attributes = automation.get_all_attributes_from_light()
+        assert all_attributes['last_updated'] == '2020-01-01T12:05:00+00:00'
+        assert all_attributes['last_changed'] == '2020-01-01T12:00:00+00:00'
+
+    def test_times_stored_as_timestamps(self, given_that, automation):
+        given_that.time_is(datetime(2020, 1, 1, 12, 0))
+        given_that.state_of(LIGHT).is_set_to('on')
+
+        assert given_that.mocked_states[LIGHT]['last_changed'] == \
+            datetime(2020, 1, 1, 12, 0, tzinfo=timezone.utc).timestamp()
@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+from appdaemon.plugins.hass.hassapi import Hass
+
+from appdaemontestframework import automation_fixture
+from appdaemontestframework.given_that import HistoryNotRecordedError
+
+LIGHT = 'light.some_light'
+SWITCH = 'switch.some_switch'
+
+
+class MockAutomation(Hass):
+    def initialize(self):
+        pass
+
+
+@automation_fixture(MockAutomation)
+def automation(given_that):
+    given_that.time_is(datetime.datetime(2020, 1, 1, 12, 0))
+    given_that.state_of(LIGHT).is_set_to('off')
+    given_that.state_history_is_recorded()
+
+
+def test_get_history(given_that, time_travel, automation):
+    time_travel.fast_forward(1).minutes()
+    given_that.state_of(LIGHT).changes_to('on', {'brightness': 100})
+    time_travel.fast_forward(5).minutes()
+    given_that.state_of(LIGHT).is_set_to('off')
+
+    history = automation.get_history(entity_id=LIGHT)
+
+    assert [(entry['state'], entry['last_changed'], entry['attributes'])
+            for entry in history[0]] == [
+        ('off', '2020-01-01T12:00:00+00:00', {}),
+        ('on', '2020-01-01T12:01:00+00:00', {'brightness': 100}),
+        ('off', '2020-01-01T12:06:00+00:00', {}),
+    ]
+
+
+def test_get_history_from_start_time(given_that, time_travel, automation):
+    for state in ('on', 'off', 'on'):
+        time_travel.fast_forward(1).minutes()
+        given_that.state_of(LIGHT).is_set_to(state)
+
+    history = automation.get_history(
+        entity_id=LIGHT, start_time=datetime.datetime(2020, 1, 1, 12, 2, 30))
+
+    # Starts with the state at `start_time`
+    assert [entry['state'] for entry in history[0]] == ['off', 'on']
+
+
+def test_get_history_of_every_entity(given_that, automation):
+    given_that.state_of(SWITCH).is_set_to('on')
+
+    history = automation.get_history()
+
+    assert {entries[0]['entity_id'] for entries in history} == {SWITCH}
+
+
+def test_history_is_bounded(given_that, time_travel, automation):
+    given_that.state_history_is_recorded(capacity=3)
+    for _ in range(10):
+        time_travel.fast_forward(1).minutes()
+        given_that.state_of(LIGHT).is_set_to('on')
+        given_that.state_of(LIGHT).is_set_to('off')
+
+    assert len(given_that.mocked_states.history_of(LIGHT)) == 3
+
+
+@automation_fixture(MockAutomation)
+def automation_without_history():
+    pass
+
+
+def test_error_when_history_not_recorded(automation_without_history):
+    with pytest.raises(HistoryNotRecordedError):
+        automation_without_history.get_history(entity_id=LIGHT)
@@ -0,0 +1,241 @@
+import pytest
+from appdaemon.plugins.hass.hassapi import Hass
+
+from appdaemontestframework import automation_fixture
+
+LIGHT = 'light.some_light'
+OTHER_LIGHT = 'light.other_light'
+SWITCH = 'switch.some_switch'
+
+
+class ListeningAutomation(Hass):
+    def initialize(self):
+        self.calls = []
+
+    def record(self, entity, attribute, old, new, kwargs):
+        self.calls.append((entity, attribute, old, new))
+
+
+@automation_fixture(ListeningAutomation)
+def automation(given_that):
+    given_that.state_of(LIGHT).is_set_to('off', {'brightness': 0})
+
+
+class TestDispatch:
+    def test_callback_called_on_change(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+
+        given_that.state_of(LIGHT).changes_to('on')
+
+        assert automation.calls == [(LIGHT, None, 'off', 'on')]
+
+    def test_is_set_to_does_not_call_callbacks(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+
+        given_that.state_of(LIGHT).is_set_to('on')
+
+        assert automation.calls == []
+
+    def test_not_called_if_state_did_not_change(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+
+        given_that.state_of(LIGHT).changes_to('off', {'brightness': 10})
+
+        assert automation.calls == []
+
+    def test_only_listeners_of_the_entity_are_called(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+        automation.listen_state(automation.record, SWITCH)
+
+        given_that.state_of(SWITCH).changes_to('on')
+
+        assert automation.calls == [(SWITCH, None, None, 'on')]
+
+    def test_domain_and_all_entities(self, given_that, automation):
+        automation.listen_state(automation.record, 'light')
+        automation.listen_state(automation.record)
+
+        given_that.state_of(OTHER_LIGHT).changes_to('on')
+        given_that.state_of(SWITCH).changes_to('on')
+
+        assert automation.calls == [
+            (OTHER_LIGHT, None, None, 'on'),
+            (OTHER_LIGHT, None, None, 'on'),
+            (SWITCH, None, None, 'on'),
+        ]
+
+    def test_attribute(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT, attribute='brightness')
+
+        given_that.state_of(LIGHT).changes_to('on')
+        given_that.state_of(LIGHT).changes_to('on', {'brightness': 50})
+
+        assert automation.calls == [(LIGHT, 'brightness', 0, 50)]
+
+    def test_all_attributes(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT, attribute='all')
+
+        given_that.state_of(LIGHT).changes_to('on')
+
+        (_, _, old, new), = automation.calls
+        assert old['state'] == 'off'
+        assert new['state'] == 'on'
+        assert new['attributes'] == {'brightness': 0}
+
+    @pytest.mark.parametrize('filters, called', [
+        ({'new': 'on'}, True),
+        ({'new': 'unavailable'}, False),
+        ({'old': 'off', 'new': 'on'}, True),
+        ({'old': 'on'}, False),
+        ({'new': lambda new: new in ('on', 'unavailable')}, True),
+    ])
+    def test_new_and_old_filters(self, given_that, automation, filters, called):
+        automation.listen_state(automation.record, LIGHT, **filters)
+
+        given_that.state_of(LIGHT).changes_to('on')
+
+        assert bool(automation.calls) == called
+
+    def test_callback_receives_the_kwargs(self, given_that, automation):
+        received = []
+        automation.listen_state(
+            lambda *args: received.append(args[4]), LIGHT, new='on', my_arg=42)
+
+        given_that.state_of(LIGHT).changes_to('on')
+
+        assert received == [{'new': 'on', 'my_arg': 42}]
+
+
+class TestCancel:
+    def test_cancelled_listener_is_not_called(self, given_that, automation):
+        handle = automation.listen_state(automation.record, LIGHT)
+
+        automation.cancel_listen_state(handle)
+        given_that.state_of(LIGHT).changes_to('on')
+
+        assert automation.calls == []
+
+    def test_oneshot(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT, oneshot=True)
+
+        given_that.state_of(LIGHT).changes_to('on')
+        given_that.state_of(LIGHT).changes_to('off')
+
+        assert automation.calls == [(LIGHT, None, 'off', 'on')]
+
+
+class TestDuration:
+    def test_called_once_the_state_lasted(self, given_that, time_travel, automation):
+        automation.listen_state(automation.record, LIGHT, new='on', duration=60)
+
+        given_that.state_of(LIGHT).changes_to('on')
+        time_travel.fast_forward(59).seconds()
+        assert automation.calls == []
+
+        time_travel.fast_forward(1).seconds()
+        assert automation.calls == [(LIGHT, None, 'off', 'on')]
+
+    def test_not_called_if_the_state_changed_meanwhile(self, given_that, time_travel, automation):
+        automation.listen_state(automation.record, LIGHT, new='on', duration=60)
+
+        given_that.state_of(LIGHT).changes_to('on')
+        time_travel.fast_forward(30).seconds()
+        given_that.state_of(LIGHT).changes_to('off')
+        time_travel.fast_forward(60).seconds()
+
+        assert automation.calls == []
+
+    def test_cancelling_the_listener_cancels_the_timer(self, given_that, time_travel, automation):
+        handle = automation.listen_state(automation.record, LIGHT, new='on', duration=60)
+
+        given_that.state_of(LIGHT).changes_to('on')
+        automation.cancel_listen_state(handle)
+        time_travel.fast_forward(60).seconds()
+
+        assert automation.calls == []
+
+
+class AsyncListeningAutomation(Hass):
+    def initialize(self):
+        self.listen_state(self._on_light, LIGHT, new='on')
+
+    async def _on_light(self, entity, attribute, old, new, kwargs):
+        await self.sleep(10)
+        self.turn_off(entity)
+
+
+@automation_fixture(AsyncListeningAutomation)
+def async_automation():
+    pass
+
+
+def test_async_callback(given_that, time_travel, assert_that, async_automation):
+    given_that.state_of(LIGHT).changes_to('on')
+    assert_that(LIGHT).was_not.turned_off()
+
+    time_travel.fast_forward(10).seconds()
+    assert_that(LIGHT).was.turned_off()
+
+
+class EveryoneLeavesAutomation(Hass):
+    def initialize(self):
+        self.seen = []
+        self.listen_state(self._on_presence, 'person')
+
+    def _on_presence(self, entity, attribute, old, new, kwargs):
+        # Snapshot of every person, as seen by the callback
+        self.seen.append((entity, dict(
+            (person, state['state']) for person, state in self.get_state('person').items())))
+
+
+@automation_fixture(EveryoneLeavesAutomation)
+def leaving(given_that):
+    given_that.state_of('person.alice').is_set_to('home')
+    given_that.state_of('person.bob').is_set_to('home')
+
+
+class TestStatesChangeAtOnce:
+    def test_listeners_see_the_final_states(self, given_that, leaving):
+        given_that.states_change_to({'person.alice': 'away', 'person.bob': 'away'})
+
+        everyone_away = {'person.alice': 'away', 'person.bob': 'away'}
+        assert leaving.seen == [('person.alice', everyone_away), ('person.bob', everyone_away)]
+
+    def test_changes_of_an_entity_are_coalesced(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+
+        with given_that.states_change_at_once():
+            given_that.state_of(LIGHT).changes_to('on')
+            given_that.state_of(LIGHT).changes_to('unavailable')
+            assert automation.calls == []
+
+        assert automation.calls == [(LIGHT, None, 'off', 'unavailable')]
+
+    def test_entity_changed_back_is_not_dispatched(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+
+        with given_that.states_change_at_once():
+            given_that.state_of(LIGHT).changes_to('on')
+            given_that.state_of(LIGHT).changes_to('off')
+
+        assert automation.calls == []
+
+    def test_states_with_attributes(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT, attribute='brightness')
+
+        given_that.states_change_to({LIGHT: ('on', {'brightness': 20}), SWITCH: 'on'})
+
+        assert automation.calls == [(LIGHT, 'brightness', 0, 20)]
+        assert automation.get_state(SWITCH) == 'on'
+
+    def test_no_listener_called_if_the_block_raises(self, given_that, automation):
+        automation.listen_state(automation.record, LIGHT)
+
+        with pytest.raises(ValueError):
+            with given_that.states_change_at_once():
+                given_that.state_of(LIGHT).changes_to('on')
+                raise ValueError()
+
+        assert automation.calls == []
+        given_that.state_of(LIGHT).changes_to('unavailable')
+        assert automation.calls == [(LIGHT, None, 'on', 'unavailable')]
@@ -0,0 +1,123 @@
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+from appdaemon.plugins.hass.hassapi import Hass
+
+from appdaemontestframework import automation_fixture
+from appdaemontestframework.states_dump import (
+    StatesDumpError,
+    load_states_dump,
+    _iter_json_array,
+)
+
+LIGHT = 'light.kitchen'
+SENSOR = 'sensor.temperature'
+
+STATES = [
+    {
+        'entity_id': LIGHT,
+        'state': 'on',
+        'attributes': {'brightness': 128, 'friendly_name': 'Kitchen'},
+        'last_changed': '2023-06-01T10:00:00.000000+00:00',
+        'last_updated': '2023-06-01T10:05:00.123456+00:00',
+    },
+    {
+        'entity_id': SENSOR,
+        'state': '21.5',
+        'attributes': {'unit_of_measurement': '°C'},
+        'last_changed': '2023-06-01T09:00:00Z',
+        'last_updated': '2023-06-01T09:00:00Z',
+    },
+]
+
+
+class MockAutomation(Hass):
+    def initialize(self):
+        pass
+
+
+@automation_fixture(MockAutomation)
+def automation():
+    pass
+
+
+@pytest.fixture
+def dump_file(tmp_path):
+    path = tmp_path / 'states.json'
+    path.write_text(json.dumps(STATES, indent=2), encoding='utf-8')
+    return path
+
+
+class TestLoadingStates:
+    def test_from_file(self, given_that, automation, dump_file):
+        given_that.states_are_loaded_from(dump_file)
+
+        assert automation.get_state(LIGHT) == 'on'
+        assert automation.get_state(LIGHT, attribute='brightness') == 128
+        assert automation.get_state(SENSOR) == '21.5'
+
+    def test_from_list(self, given_that, automation):
+        given_that.states_are_loaded_from(STATES)
+        assert automation.get_state(LIGHT) == 'on'
+
+    def test_from_dict(self, given_that, automation):
+        given_that.states_are_loaded_from({LIGHT: {'state': 'off'}})
+        assert automation.get_state(LIGHT) == 'off'
+        assert automation.get_state(LIGHT, attribute='brightness') is None
+
+    def test_timestamps(self, given_that, automation):
+        given_that.states_are_loaded_from(STATES)
+
+        state = automation.get_state(LIGHT, attribute='all')
+        assert state['last_changed'] == '2023-06-01T10:00:00+00:00'
+        assert state['last_updated'] == '2023-06-01T10:05:00.123456+00:00'
+        assert automation.get_state(SENSOR, attribute='all')['last_changed'] == \
+            datetime(2023, 6, 1, 9, tzinfo=timezone.utc).isoformat()
+
+    def test_states_can_be_changed_afterwards(self, given_that, automation, dump_file):
+        given_that.states_are_loaded_from(dump_file)
+        given_that.state_of(LIGHT).is_set_to('off')
+
+        assert automation.get_state(LIGHT) == 'off'
+        assert load_states_dump(dump_file)[LIGHT]['main'] == 'on'
+
+    def test_state_without_entity_id(self, given_that):
+        with pytest.raises(StatesDumpError, match="without 'entity_id'"):
+            given_that.states_are_loaded_from([{'state': 'on'}])
+
+
+class TestDumpFiles:
+    def test_parsed_once_per_session(self, dump_file):
+        assert load_states_dump(dump_file) is load_states_dump(str(dump_file))
+
+    def test_parsed_again_when_modified(self, dump_file):
+        before = load_states_dump(dump_file)
+        dump_file.write_text(json.dumps(STATES[:1]), encoding='utf-8')
+
+        after = load_states_dump(dump_file)
+        assert after is not before
+        assert list(after) == [LIGHT]
+
+    def test_not_an_array(self, tmp_path):
+        path = tmp_path / 'states.json'
+        path.write_text('{}', encoding='utf-8')
+        with pytest.raises(StatesDumpError, match='JSON array'):
+            load_states_dump(path)
+
+    def test_truncated(self, tmp_path):
+        path = tmp_path / 'states.json'
+        path.write_text(json.dumps(STATES)[:-1], encoding='utf-8')
+        with pytest.raises(StatesDumpError, match='Unexpected end'):
+            load_states_dump(path)
+
+
+class TestStreaming:
+    @pytest.mark.parametrize('chunk_size', [1, 7, 64, 100_000])
+    def test_items_spanning_chunks(self, chunk_size):
+        dump = json.dumps(STATES * 10, indent=2)
+        assert list(_iter_json_array(io.StringIO(dump), chunk_size)) == STATES * 10
+
+    def test_empty_array(self):
+        assert list(_iter_json_array(io.StringIO(' [ ] '))) == []
@@ -20,6 +20,23 @@ def automation_at_noon(given_that):
     given_that.time_is(datetime.datetime(2020, 1, 1, 12, 0))
 
 
+class MorningAutomation(Hass):
+    def initialize(self):
+        self.calls = []
+        self.run_once(self._record, datetime.time(7), label='run_once')
+        self.run_at(self._record, "07:30:00", label='run_at')
+        self.run_in(self._record, 60, label='run_in')
+        self.run_every(self._record, "now+5", 300, label='run_every')
+
+    def _record(self, kwargs):
+        self.calls.append((kwargs['label'], self.datetime()))
+
+
+@automation_fixture(MorningAutomation)
+def morning_automation(given_that):
+    given_that.time_is(datetime.datetime(2020, 1, 1, 6, 0))
+
+
 def test_callback_not_called_before_timeout(time_travel, automation):
     foo = mock.Mock()
     automation.run_in(foo, 10)
@@ -125,3 +142,188 @@ class Test_callback_execution:
         automation.run_in(callback_mock, 1, arg1="asdf", arg2="qwerty")
         time_travel.fast_forward(10).seconds()
         callback_mock.assert_called_once_with({"arg1": "asdf", "arg2": "qwerty"})
+
+
+class Test_recurring_callbacks:
+    def test_run_every(self, time_travel, automation_at_noon):
+        callback_mock = mock.Mock()
+        automation_at_noon.run_every(
+            callback_mock, datetime.datetime(2020, 1, 1, 12, 0, 30), 60, arg="ok"
+        )
+
+        time_travel.fast_forward(10).minutes()
+
+        assert callback_mock.call_count == 10
+        callback_mock.assert_called_with({"arg": "ok"})
+
+    def test_run_every_starting_now_first_runs_after_one_interval(
+        self, time_travel, automation_at_noon
+    ):
+        callback_mock = mock.Mock()
+        automation_at_noon.run_every(callback_mock, "now", datetime.timedelta(minutes=5))
+
+        time_travel.fast_forward(299).seconds()
+        callback_mock.assert_not_called()
+        time_travel.fast_forward(1).seconds()
+        callback_mock.assert_called_once()
+
+    def test_run_daily(self, time_travel, automation_at_noon):
+        time_when_called = []
+        automation_at_noon.run_daily(
+            lambda kwargs: time_when_called.append(automation_at_noon.datetime()),
+            datetime.time(hour=8),
+        )
+
+        time_travel.fast_forward(3 * 24 * 60).minutes()
+
+        assert time_when_called == [
+            datetime.datetime(2020, 1, 2, 8, 0),
+            datetime.datetime(2020, 1, 3, 8, 0),
+            datetime.datetime(2020, 1, 4, 8, 0),
+        ]
+
+    def test_run_hourly_and_minutely(self, time_travel, automation_at_noon):
+        hourly = mock.Mock()
+        minutely = mock.Mock()
+        automation_at_noon.run_hourly(hourly, datetime.time(minute=15))
+        automation_at_noon.run_minutely(minutely, None)
+
+        time_travel.fast_forward(2 * 60).minutes()
+
+        assert hourly.call_count == 2
+        assert minutely.call_count == 120
+
+    def test_run_at_and_run_once_only_run_once(self, time_travel, automation_at_noon):
+        at_datetime = mock.Mock()
+        once_at_time = mock.Mock()
+        automation_at_noon.run_at(at_datetime, datetime.datetime(2020, 1, 1, 12, 30))
+        automation_at_noon.run_once(once_at_time, datetime.time(hour=11))
+
+        time_travel.fast_forward(30).minutes()
+        at_datetime.assert_called_once()
+        once_at_time.assert_not_called()
+
+        time_travel.fast_forward(2 * 24 * 60).minutes()
+        at_datetime.assert_called_once()
+        once_at_time.assert_called_once()
+
+    def test_recurring_callbacks_can_be_cancelled(self, time_travel, automation):
+        callback_mock = mock.Mock()
+        handle = automation.run_every(callback_mock, "now", 10)
+        time_travel.fast_forward(30).seconds()
+        automation.cancel_timer(handle)
+        time_travel.fast_forward(30).seconds()
+
+        assert callback_mock.call_count == 3
+
+    def test_recurring_callbacks_follow_the_start_time(
+        self, time_travel, given_that, automation
+    ):
+        callback_mock = mock.Mock()
+        automation.run_daily(callback_mock, datetime.time(hour=8))
+
+        given_that.time_is(datetime.datetime(2020, 1, 1, 12, 0))
+        time_travel.fast_forward(19 * 60).minutes()
+
+        assert automation.datetime() == datetime.datetime(2020, 1, 2, 7, 0)
+        callback_mock.assert_not_called()
+        time_travel.fast_forward(60).minutes()
+        callback_mock.assert_called_once()
+
+
+    def test_run_every_starting_now_plus_some_seconds(self, time_travel, automation_at_noon):
+        callback_mock = mock.Mock()
+        automation_at_noon.run_every(callback_mock, "now + 5", 300)
+
+        time_travel.fast_forward(5).seconds()
+        callback_mock.assert_called_once()
+        time_travel.fast_forward(300).seconds()
+        assert callback_mock.call_count == 2
+
+    def test_extra_positional_args_are_passed_to_the_callback(self, time_travel, automation_at_noon):
+        callback_mock = mock.Mock()
+        automation_at_noon.run_daily(callback_mock, datetime.time(hour=13), 'extra', arg='ok')
+        automation_at_noon.run_once(callback_mock, datetime.time(hour=14), 'once')
+
+        time_travel.fast_forward(2 * 60).minutes()
+
+        assert callback_mock.call_args_list == [
+            mock.call('extra', {'arg': 'ok'}),
+            mock.call('once', {}),
+        ]
+
+
+class Test_start_time_set_after_initialize:
+    def test_one_off_callbacks_follow_the_start_time(self, time_travel, morning_automation):
+        time_travel.fast_forward(2 * 60).minutes()
+
+        assert [call for call in morning_automation.calls if call[0] != 'run_every'] == [
+            ('run_in', datetime.datetime(2020, 1, 1, 6, 1)),
+            ('run_once', datetime.datetime(2020, 1, 1, 7, 0)),
+            ('run_at', datetime.datetime(2020, 1, 1, 7, 30)),
+        ]
+
+    def test_time_of_day_already_passed_runs_the_next_day(self, given_that, time_travel, automation):
+        callback_mock = mock.Mock()
+        automation.run_once(callback_mock, datetime.time(7))
+
+        given_that.time_is(datetime.datetime(2020, 1, 1, 8, 0))
+        time_travel.fast_forward(23 * 60 - 1).minutes()
+        callback_mock.assert_not_called()
+        time_travel.fast_forward(1).minutes()
+        callback_mock.assert_called_once()
+
+    def test_can_not_move_after_a_callback_registered_at_a_datetime(self, given_that, automation):
+        automation.run_at(mock.Mock(), datetime.datetime(2000, 1, 2, 0, 0))
+
+        with pytest.raises(RuntimeError):
+            given_that.time_is(datetime.datetime(2020, 1, 1, 8, 0))
+
+
+class Test_event_driven_fast_forward:
+    def test_fast_forward_to_next_event(self, time_travel, automation_at_noon):
+        callback_mock = mock.Mock()
+        automation_at_noon.run_in(callback_mock, 3600)
+
+        time_travel.fast_forward_to_next_event()
+
+        callback_mock.assert_called_once()
+        assert automation_at_noon.datetime() == datetime.datetime(2020, 1, 1, 13, 0)
+
+    def test_fast_forward_until_idle(self, time_travel, automation_at_noon):
+        daily = mock.Mock()
+        automation_at_noon.run_daily(daily, datetime.time(hour=8))
+        automation_at_noon.run_in(mock.Mock(), datetime.timedelta(days=30))
+
+        time_travel.fast_forward_until_idle()
+
+        assert daily.call_count == 30
+        assert automation_at_noon.datetime() == datetime.datetime(2020, 1, 31, 12, 0)
+
+    def test_fast_forward_until_idle_with_more_callbacks(self, time_travel, automation_at_noon):
+        every_minute = mock.Mock()
+        automation_at_noon.run_every(every_minute, "now", 60)
+        automation_at_noon.run_in(mock.Mock(), datetime.timedelta(days=3))
+
+        with pytest.raises(RuntimeError, match='Still not idle after running 1000 callbacks'):
+            time_travel.fast_forward_until_idle(max_callbacks=1000)
+        time_travel.fast_forward_until_idle(max_callbacks=None)
+
+        assert automation_at_noon.datetime() == datetime.datetime(2020, 1, 4, 12, 0)
+        assert every_minute.call_count == 3 * 24 * 60
+
+
+def test_scheduler_functions_use_the_scheduler_of_the_automation_called(
+    hass_mocks, automation
+):
+    from appdaemontestframework.appdaemon_mock.appdaemon import MockAppDaemon
+
+    callback_mock = mock.Mock()
+    automation.AD = MockAppDaemon()
+    automation.AD.sched.sim_set_start_time(datetime.datetime(2020, 1, 1, 12, 0))
+
+    handle = automation.run_in(callback_mock, 10)
+
+    assert hass_mocks.AD.sched.sim_next_event_time() is None
+    assert automation.datetime() == datetime.datetime(2020, 1, 1, 12, 0)
+    assert automation.cancel_timer(handle) is True